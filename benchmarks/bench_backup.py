@@ -0,0 +1,99 @@
+"""
+Benchmark of online backups while the database is being written.
+
+It fills a SQLite database, then takes a compressed snapshot with `backup_database` while a
+writer thread keeps inserting URL entries and a reader thread keeps looking them up. It prints
+the backup report (throughput, steps, restarts, longest read lock) along with the latencies seen by
+the writer and the reader, which is how writer stalls are measured: the backup itself takes no
+extra lock to measure them. Each write restarts the copy: when writes are so frequent that
+every attempt hits the restart limit, the backup fails and the benchmark says so.
+
+Run with:
+    python benchmarks/bench_backup.py [--rows 200000] [--pages 64] [--pause-ms 5] [--write-interval-ms 20]
+"""
+
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+from sqlalchemy import create_engine, insert, select
+
+from shortener_app.backup import BackupError, backup_database
+from shortener_app.database import init_db
+from shortener_app.models import URL
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--pages", type=int, default=64)
+    parser.add_argument("--pause-ms", type=float, default=5.0)
+    parser.add_argument("--write-interval-ms", type=float, default=20.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "shortener.db")
+        engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False, "timeout": 60})
+        init_db(bind=engine)
+        with engine.begin() as connection:
+            for start in range(0, args.rows, 10_000):
+                connection.execute(insert(URL.__table__), [
+                    {"key": f"K{i}", "secret_key": f"S{i}", "target_url": f"https://example.com/page/{i}"}
+                    for i in range(start, min(start + 10_000, args.rows))
+                ])
+
+        stop = threading.Event()
+        latencies = []
+
+        def writer():
+            index = 0
+            while not stop.is_set():
+                start = time.perf_counter()
+                with engine.begin() as connection:
+                    connection.execute(insert(URL.__table__), {"key": f"W{index}", "secret_key": f"WS{index}", "target_url": "https://example.com"})
+                latencies.append(time.perf_counter() - start)
+                index += 1
+                time.sleep(args.write_interval_ms / 1000)
+
+        reads = []
+
+        def reader():
+            index = 0
+            while not stop.is_set():
+                start = time.perf_counter()
+                with engine.connect() as connection:
+                    connection.execute(select(URL.target_url).where(URL.key == f"K{index % args.rows}")).first()
+                reads.append(time.perf_counter() - start)
+                index += 7919
+                time.sleep(0.001)
+
+        threads = [threading.Thread(target=writer), threading.Thread(target=reader)]
+        for thread in threads:
+            thread.start()
+        report = None
+        try:
+            report = backup_database(
+                path, os.path.join(directory, "snapshot.db"), pages=args.pages, pause=args.pause_ms / 1000
+            )
+        except BackupError as error:
+            print(f"backup failed: {error}")
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
+            engine.dispose()
+
+    for name, value in (report.as_dict() if report else {}).items():
+        if name not in ("source", "destination"):
+            print(f"{name:>22}: {value:.2f}" if isinstance(value, float) else f"{name:>22}: {value}")
+    for name, timings in (("write", latencies), ("read", reads)):
+        timings.sort()
+        if timings:
+            print(f"{name + 's during backup':>22}: {len(timings)}")
+            print(f"{name + ' p50 / max (ms)':>22}: {timings[len(timings) // 2] * 1000:.2f} / {timings[-1] * 1000:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Benchmark of URL creation throughput with and without group commit.
+
+Concurrent threads create URL entries in a file-backed SQLite database, either each with its
+own commit (`crud.create_db_url`) or through `GroupCommitWriter`. The batch sizes achieved by
+the writer are reported as well.
+
+Run with:
+    python benchmarks/bench_group_commit.py [--threads 32] [--per-thread 50] [--max-delay-ms 5]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from shortener_app import crud, schemas
+from shortener_app.database import init_db
+from shortener_app.group_commit import GroupCommitWriter
+
+
+def run(threads: int, per_thread: int, create) -> float:
+    """
+    Return the number of URL entries created per second.
+    """
+    def worker(index):
+        for count in range(per_thread):
+            create(schemas.URLBase(target_url=f"https://example.com/{index}/{count}"))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as executor:
+        list(executor.map(worker, range(threads)))
+    return threads * per_thread / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--per-thread", type=int, default=50)
+    parser.add_argument("--max-delay-ms", type=float, default=5.0)
+    parser.add_argument("--max-batch", type=int, default=100)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(
+            f"sqlite:///{os.path.join(directory, 'bench.db')}",
+            connect_args={"check_same_thread": False, "timeout": 30},
+        )
+        init_db(bind=engine)
+        SessionLocal = sessionmaker(bind=engine)
+
+        def create_with_own_commit(url):
+            db = SessionLocal()
+            try:
+                crud.create_db_url(db, url)
+            finally:
+                db.close()
+
+        writer = GroupCommitWriter(SessionLocal, max_delay=args.max_delay_ms / 1000, max_batch=args.max_batch)
+
+        own = run(args.threads, args.per_thread, create_with_own_commit)
+        grouped = run(args.threads, args.per_thread, lambda url: writer.create(crud.build_db_url(url)))
+        writer.stop()
+        engine.dispose()
+
+    print(f"one commit per create: {own:8.0f} creates/s")
+    print(f"group commit:          {grouped:8.0f} creates/s ({grouped / own:.1f}x)")
+    print(f"batch sizes: {writer.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Benchmark of the admin listing: keyset pagination against offset pagination on deep pages.
+
+It fills a SQLite database with URL entries spread over a few target domains, then times
+fetching a page at increasing depths, with and without the active and domain filters, once
+with `crud.list_db_urls` (keyset: `id > last_id`, or `(target_domain, id)` after the last
+entry with a domain prefix) and once with the equivalent `OFFSET`
+query. It also prints the query plans of the keyset queries. Use `--rows 10000000` for the
+10M-row measurement (the database takes a few minutes to fill).
+
+Run with:
+    python benchmarks/bench_listing.py [--rows 1000000] [--limit 100]
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from sqlalchemy import create_engine, event, insert
+from sqlalchemy.orm import Session
+
+from shortener_app import crud
+from shortener_app.database import init_db
+from shortener_app.models import URL
+
+DOMAINS = [f"site{i}.example.com" for i in range(50)] + ["docs.python.org", "github.com"]
+
+FILTERS = {
+    "none": {},
+    "active": {"is_active": True},
+    "domain": {"domain": "docs."},
+    "active+domain": {"is_active": True, "domain": "site1"},
+    "active+clicks": {"is_active": True, "min_clicks": 500},
+}
+
+
+def fill(engine, rows: int):
+    rng = random.Random(42)
+    with engine.begin() as connection:
+        for start in range(0, rows, 50_000):
+            batch = []
+            for i in range(start, min(start + 50_000, rows)):
+                domain = rng.choice(DOMAINS)
+                batch.append({
+                    "key": f"K{i}",
+                    "secret_key": f"S{i}",
+                    "target_url": f"https://{domain}/page/{i}",
+                    "target_domain": domain,
+                    "is_active": rng.random() < 0.9,
+                    "clicks": rng.randrange(1000),
+                })
+            connection.execute(insert(URL.__table__), batch)
+
+
+def best_of(function, repeat: int = 5) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def offset_page(db: Session, offset: int, limit: int, is_active=None, min_clicks=None, domain=None):
+    query = db.query(*crud.URL_INFO_COLUMNS, URL.target_domain)
+    if is_active is not None:
+        query = query.filter(URL.is_active == is_active)
+    if min_clicks is not None:
+        query = query.filter(URL.clicks >= min_clicks)
+    if domain:
+        query = query.filter(URL.target_domain.startswith(domain)).order_by(URL.target_domain)
+    return query.order_by(URL.id).offset(offset).limit(limit).all()
+
+
+def listing_plan(engine, db: Session, filters: dict) -> list:
+    """
+    Return the query plan of the statement `crud.list_db_urls` runs for some filters.
+    """
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        crud.list_db_urls(db, limit=10, **filters)
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+    with engine.connect() as connection:
+        return [
+            row[-1]
+            for statement, parameters in statements
+            for row in connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)
+        ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--limit", type=int, default=100)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(f"sqlite:///{os.path.join(directory, 'shortener.db')}")
+        init_db(bind=engine)
+        start = time.perf_counter()
+        fill(engine, args.rows)
+        print(f"filled {args.rows} rows in {time.perf_counter() - start:.1f} s\n")
+
+        db = Session(bind=engine)
+        try:
+            depths = [depth for depth in (0, args.rows // 100, args.rows // 10, args.rows // 2, args.rows - args.limit * 2) if depth >= 0]
+            print(f"{'filter':>14} {'depth':>10} {'keyset (ms)':>12} {'offset (ms)':>12}")
+            for name, filters in FILTERS.items():
+                for depth in depths:
+                    # Position the cursor where an offset page at this depth would start
+                    after = offset_page(db, depth, 1, **filters)
+                    if not after:
+                        continue
+                    cursor = f"0:{after[0].id - 1}"
+                    if "domain" in filters:
+                        cursor += f":{after[0].target_domain}"
+                    keyset = best_of(lambda: crud.list_db_urls(db, cursor=cursor, limit=args.limit, **filters))
+                    offset = best_of(lambda: offset_page(db, depth, args.limit, **filters), repeat=1 if depth else 5)
+                    print(f"{name:>14} {depth:>10} {keyset * 1000:>12.2f} {offset * 1000:>12.2f}")
+
+            print("\nkeyset query plans (of the statements run by crud.list_db_urls):")
+            for name, filters in FILTERS.items():
+                print(f"{name:>14}: {'; '.join(listing_plan(engine, db, filters))}")
+        finally:
+            db.close()
+            engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Benchmark of the overhead added by the rate-limiting middleware.
+
+It measures the cost of a single `TokenBucketLimiter.acquire` call for a growing number
+of distinct clients, then the cost of an ASGI call to a trivial application with and
+without `RateLimitMiddleware`.
+
+Run with:
+    python benchmarks/bench_ratelimit.py
+"""
+
+import asyncio
+import time
+
+from shortener_app import ratelimit
+from shortener_app.ratelimit import RateLimitMiddleware, TokenBucketLimiter
+
+
+def bench_acquire(clients: int, calls: int = 200_000) -> float:
+    """
+    Return the mean cost of `acquire` in nanoseconds, spreading calls over `clients` keys.
+    """
+    limiter = TokenBucketLimiter(rate=1e9, capacity=1e9)
+    keys = [f"ip:10.0.{i // 256}.{i % 256}" for i in range(clients)]
+    start = time.perf_counter()
+    for i in range(calls):
+        limiter.acquire(keys[i % clients])
+    return (time.perf_counter() - start) / calls * 1e9
+
+
+async def _inner_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 307, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+
+async def _drive(app, calls: int) -> float:
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "path": "/ABCDE",
+        "headers": [],
+        "client": ("10.0.0.1", 50000),
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        pass
+
+    start = time.perf_counter()
+    for _ in range(calls):
+        await app(scope, receive, send)
+    return (time.perf_counter() - start) / calls * 1e9
+
+
+def bench_middleware(calls: int = 200_000) -> tuple:
+    """
+    Return the mean cost in nanoseconds of an ASGI call without and with the middleware.
+    """
+    limited = RateLimitMiddleware(_inner_app, limits={ratelimit.REDIRECT: (1e9, 1e9)})
+    baseline = asyncio.run(_drive(_inner_app, calls))
+    return baseline, asyncio.run(_drive(limited, calls))
+
+
+if __name__ == "__main__":
+    for clients in (1, 1_000, 100_000):
+        print(f"acquire, {clients:>7} clients: {bench_acquire(clients):8.1f} ns/call")
+    baseline, limited = bench_middleware()
+    print(f"ASGI call without limiter: {baseline:8.1f} ns")
+    print(f"ASGI call with limiter:    {limited:8.1f} ns ({limited - baseline:+.1f} ns)")
@@ -0,0 +1,67 @@
+"""
+Startup benchmark based on `python -X importtime`.
+
+It imports `shortener_app.main` in fresh interpreters, reports the cumulative import time
+of the application and the modules with the largest self time, and exits with a non-zero
+status when the best run exceeds the budget, so it can be used as a CI gate.
+
+Run with:
+    python benchmarks/bench_startup.py [--budget-ms 400] [--runs 5]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+MODULE = "shortener_app.main"
+
+
+def measure_import(module: str = MODULE) -> dict:
+    """
+    Import a module in a fresh interpreter and parse its `-X importtime` report.
+
+    Returns:
+        dict: A mapping from module name to a `(self_us, cumulative_us)` tuple.
+    """
+    env = dict(os.environ)
+    sources = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "sources")
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [sources, env.get("PYTHONPATH")]))
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        env=env,
+        stderr=subprocess.PIPE,
+        stdout=subprocess.DEVNULL,
+        text=True,
+        check=True,
+    )
+    timings = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        timings[name.strip()] = (int(self_us), int(cumulative_us))
+    return timings
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget-ms", type=float, default=400.0, help="maximum import time of the application")
+    parser.add_argument("--runs", type=int, default=5, help="number of fresh interpreters to sample")
+    parser.add_argument("--top", type=int, default=10, help="number of slowest modules to report")
+    args = parser.parse_args()
+
+    runs = [measure_import() for _ in range(args.runs)]
+    best = min(runs, key=lambda timings: timings[MODULE][1])
+    total_ms = best[MODULE][1] / 1000
+
+    print(f"{MODULE} import time: {total_ms:.1f} ms (best of {args.runs}, budget {args.budget_ms:.0f} ms)")
+    print("slowest modules by self time:")
+    for name, (self_us, _) in sorted(best.items(), key=lambda item: -item[1][0])[:args.top]:
+        print(f"  {self_us / 1000:8.1f} ms  {name}")
+
+    return 0 if total_ms <= args.budget_ms else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,171 @@
+"""
+This module supports custom aliases (vanity keys) such as `/spring-sale`.
+
+Whether an alias is free is always decided by the database, with a single probe on the unique
+index of `urls.key`. Suggestions for a taken alias come from `AliasIndex`, an in-memory sorted
+list of all keys loaded from the `urls` table at startup and kept up to date as URLs are created.
+The list is split into chunks of bounded size, so an insertion only shifts the keys of one chunk,
+and lookups are binary searches over the chunk maxima then within a chunk: both stay fast with
+millions of keys.
+"""
+
+import re
+import threading
+from bisect import bisect_left, insort
+from typing import Callable, Iterable, List
+
+from sqlalchemy.orm import Session
+
+from . import models
+
+ALIAS_PATTERN = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_-]{1,63}$")
+
+# Path segments already used by the application routes
+RESERVED_ALIASES = {"admin", "alias", "docs", "redoc", "openapi.json", "url"}
+
+
+def is_valid_alias(alias: str) -> bool:
+    """
+    Check that an alias is well formed and does not shadow an application route.
+
+    Args:
+        alias (str): The requested alias.
+
+    Returns:
+        bool: True if the alias can be used as a short key.
+    """
+    return bool(ALIAS_PATTERN.match(alias)) and alias.lower() not in RESERVED_ALIASES
+
+
+class AliasIndex:
+    """
+    A sorted, thread-safe in-memory index of the short keys stored in the `urls` table.
+
+    The keys are kept in sorted chunks of at most `2 * chunk_size` keys, along with the largest
+    key of each chunk.
+
+    Args:
+        keys (iterable, optional): The initial keys.
+        chunk_size (int): The number of keys per chunk when the index is built.
+    """
+
+    def __init__(self, keys: Iterable[str] = (), chunk_size: int = 1000):
+        self.chunk_size = chunk_size
+        self._lock = threading.Lock()
+        self._chunks: List[List[str]] = []
+        self._maxes: List[str] = []
+        self._length = 0
+        self._build(sorted(set(keys)))
+
+    def _build(self, keys: List[str]):
+        size = self.chunk_size
+        self._chunks = [keys[start:start + size] for start in range(0, len(keys), size)]
+        self._maxes = [chunk[-1] for chunk in self._chunks]
+        self._length = len(keys)
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            position = bisect_left(self._maxes, key)
+            if position == len(self._maxes):
+                return False
+            chunk = self._chunks[position]
+            index = bisect_left(chunk, key)
+            return index < len(chunk) and chunk[index] == key
+
+    def load(self, db: Session, batch_size: int = 10000):
+        """
+        Replace the content of the index with the keys stored in the database.
+
+        Args:
+            db (Session): The SQLAlchemy database session.
+            batch_size (int): The number of keys fetched at a time.
+        """
+        keys = sorted(key for (key,) in db.query(models.URL.key).yield_per(batch_size))
+        with self._lock:
+            self._build(keys)
+
+    def add(self, key: str):
+        """
+        Insert a key in the index, if it is not already present.
+
+        Only the chunk receiving the key is shifted; a chunk growing past twice the chunk size
+        is split in two.
+
+        Args:
+            key (str): The short key of a newly created URL entry.
+        """
+        with self._lock:
+            if not self._chunks:
+                self._chunks.append([key])
+                self._maxes.append(key)
+                self._length = 1
+                return
+            position = min(bisect_left(self._maxes, key), len(self._maxes) - 1)
+            chunk = self._chunks[position]
+            index = bisect_left(chunk, key)
+            if index < len(chunk) and chunk[index] == key:
+                return
+            insort(chunk, key)
+            self._maxes[position] = chunk[-1]
+            self._length += 1
+            if len(chunk) > 2 * self.chunk_size:
+                half = len(chunk) // 2
+                self._chunks[position:position + 1] = [chunk[:half], chunk[half:]]
+                self._maxes[position:position + 1] = [chunk[half - 1], chunk[-1]]
+
+    def with_prefix(self, prefix: str, limit: int = 100) -> List[str]:
+        """
+        Return the indexed keys starting with a prefix, in sorted order.
+
+        Args:
+            prefix (str): The prefix to look up.
+            limit (int): The maximum number of keys returned.
+
+        Returns:
+            list: Up to `limit` keys starting with `prefix`.
+        """
+        found: List[str] = []
+        with self._lock:
+            position = bisect_left(self._maxes, prefix)
+            index = bisect_left(self._chunks[position], prefix) if position < len(self._chunks) else 0
+            for chunk in self._chunks[position:]:
+                for key in chunk[index:]:
+                    if not key.startswith(prefix) or len(found) == limit:
+                        return found
+                    found.append(key)
+                index = 0
+        return found
+
+    def suggest(self, alias: str, is_available: Callable[[str], bool], count: int = 3) -> List[str]:
+        """
+        Suggest free variants of a taken alias, such as `spring-sale-2`, `spring-sale-3`, ...
+
+        Numbered variants already in the index are skipped without touching the database,
+        and each remaining candidate is confirmed with `is_available`, since keys created by
+        other processes may be missing from this index.
+
+        Args:
+            alias (str): The alias that is already taken.
+            is_available (callable): A function checking a candidate against the database.
+            count (int): The number of suggestions wanted.
+
+        Returns:
+            list: Up to `count` available aliases.
+        """
+        base = alias[:60]
+        taken = set(self.with_prefix(base + "-", limit=10000))
+        suggestions = []
+        number = 2
+        while len(suggestions) < count and number < 2 + len(taken) + count * 10:
+            candidate = f"{base}-{number}"
+            number += 1
+            if candidate not in taken and is_available(candidate):
+                suggestions.append(candidate)
+        return suggestions
+
+
+# The index used by the application, loaded at startup
+alias_index = AliasIndex()
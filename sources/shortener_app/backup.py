@@ -0,0 +1,506 @@
+"""
+This module takes online backups of the SQLite databases of the URL shortener application.
+
+Backups use SQLite's online backup API, copying a few pages per step and pausing between
+steps, so redirects and URL creations keep running while a snapshot is taken. A writer that
+commits during a backup makes SQLite restart the copy. After `max_restarts` restarts, the
+attempt is abandoned and retried later with smaller steps and longer pauses; the copy is
+never finished in one step, which would lock writers out for the whole copy. When every
+attempt is abandoned, the snapshot fails with `BackupError`.
+
+A backup takes no lock of its own beyond the read lock SQLite holds during each step. The
+report gives the longest of those steps (`max_read_lock_ms`), which bounds how long a writer
+committing in rollback-journal mode can wait on the backup; it is not a latency measured on
+a writer. `benchmarks/bench_backup.py` measures the latency of real writers during a backup.
+
+Snapshots are gzip-compressed, verified with `PRAGMA integrity_check`, and pruned to the
+newest `retention` files per database. From the command line:
+    python -m shortener_app.backup snapshot [--directory ./backups]
+    python -m shortener_app.backup verify ./backups/shortener-20240101T000000.db.gz
+    python -m shortener_app.backup restore ./backups/shortener-20240101T000000.db.gz ./shortener.db
+"""
+
+import gzip
+import logging
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_TIME_FORMAT = "%Y%m%dT%H%M%S%f"
+
+# The step results of a backup that copied nothing because the source was locked
+_SQLITE_BUSY = 5
+_SQLITE_LOCKED = 6
+
+
+class BackupError(Exception):
+    """
+    Raised when a snapshot cannot be completed without blocking the writers of the database.
+    """
+
+
+@dataclass
+class BackupReport:
+    """
+    The measurements of a backup.
+
+    Attributes:
+        source (str): The path of the database that was backed up.
+        destination (str): The path of the snapshot.
+        pages (int): The number of database pages copied.
+        bytes (int): The size of the database copy, before compression.
+        compressed_bytes (int): The size of the snapshot file.
+        seconds (float): The duration of the backup, including compression.
+        throughput_mb_s (float): The copied megabytes per second of copy time.
+        steps (int): The number of backup steps.
+        restarts (int): The number of times SQLite restarted the copy after a concurrent write.
+        attempts (int): The number of copy attempts, more than 1 when the restart limit was hit.
+        max_read_lock_ms (float): The longest backup step, during which the source is
+            read-locked, derived from the backup's own timings (busy retries excluded).
+    """
+    source: str
+    destination: str
+    pages: int = 0
+    bytes: int = 0
+    compressed_bytes: int = 0
+    seconds: float = 0.0
+    throughput_mb_s: float = 0.0
+    steps: int = 0
+    restarts: int = 0
+    attempts: int = 0
+    max_read_lock_ms: float = 0.0
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+class _RestartLimitReached(Exception):
+    pass
+
+
+def sqlite_path(engine: Engine) -> str:
+    """
+    Return the file path of a SQLite engine.
+
+    Args:
+        engine (Engine): A SQLAlchemy engine.
+
+    Returns:
+        str: The path of the database file.
+
+    Raises:
+        ValueError: If the engine is not backed by a SQLite file.
+    """
+    database = engine.url.database
+    if engine.url.get_backend_name() != "sqlite" or not database or database == ":memory:":
+        raise ValueError(f"Only SQLite database files can be backed up, not '{engine.url}'")
+    return database
+
+
+def backup_database(
+    source_path: str,
+    destination_path: str,
+    pages: int = 64,
+    pause: float = 0.005,
+    max_restarts: int = 10,
+    compress: bool = True,
+    attempts: int = 3,
+    retry_delay: float = 1.0,
+) -> BackupReport:
+    """
+    Copy a SQLite database to a file with the online backup API, a few pages at a time.
+
+    Args:
+        source_path (str): The path of the database to back up.
+        destination_path (str): The path of the snapshot; `.gz` is appended when compressed.
+        pages (int): The number of pages copied per step.
+        pause (float): The time in seconds to yield to other connections between steps.
+        max_restarts (int): The number of restarts caused by concurrent writes after which an
+            attempt is abandoned.
+        compress (bool): Whether the snapshot is gzip-compressed.
+        attempts (int): The number of copy attempts. Each retry waits `retry_delay` times the
+            number of attempts made, and halves the step size and doubles the pause.
+        retry_delay (float): The time in seconds to wait before the first retry.
+
+    Returns:
+        BackupReport: The measurements of the backup.
+
+    Raises:
+        BackupError: If every attempt hit the restart limit.
+    """
+    if compress and not destination_path.endswith(".gz"):
+        destination_path += ".gz"
+    report = BackupReport(source=source_path, destination=destination_path)
+    directory = os.path.dirname(os.path.abspath(destination_path))
+    os.makedirs(directory, exist_ok=True)
+    fd, copy_path = tempfile.mkstemp(suffix=".db", dir=directory)
+    os.close(fd)
+
+    start = time.perf_counter()
+    state = {}
+
+    def progress(status, remaining, total):
+        now = time.perf_counter()
+        report.steps += 1
+        # A busy step copied nothing, and the time since it includes SQLite's busy sleep
+        if not state["busy"]:
+            report.max_read_lock_ms = max(report.max_read_lock_ms, (now - state["last"]) * 1000)
+        state["busy"] = status in (_SQLITE_BUSY, _SQLITE_LOCKED)
+        # Without a restart, every step leaves fewer pages to copy
+        if state["remaining"] is not None and remaining >= state["remaining"] and not state["busy"]:
+            report.restarts += 1
+            state["restarts"] += 1
+            if state["restarts"] > max_restarts:
+                raise _RestartLimitReached()
+        state["remaining"] = remaining
+        report.pages = total
+        if remaining:
+            time.sleep(state["pause"])
+        state["last"] = time.perf_counter()
+
+    try:
+        source = sqlite3.connect(source_path, timeout=60)
+        destination = sqlite3.connect(copy_path)
+        try:
+            step_pages, step_pause = pages, pause
+            while True:
+                report.attempts += 1
+                state.update(last=time.perf_counter(), remaining=None, restarts=0, busy=False, pause=step_pause)
+                try:
+                    source.backup(destination, pages=step_pages, progress=progress, sleep=step_pause)
+                    break
+                except _RestartLimitReached:
+                    if report.attempts >= attempts:
+                        raise BackupError(
+                            f"Backup of {source_path} abandoned: the copy restarted more than {max_restarts} "
+                            f"times in each of {attempts} attempts because of concurrent writes"
+                        ) from None
+                    logger.warning(
+                        "Backup of %s restarted %d times, retrying with smaller steps", source_path, report.restarts
+                    )
+                    time.sleep(retry_delay * report.attempts)
+                    step_pages, step_pause = max(1, step_pages // 2), step_pause * 2
+            copy_seconds = time.perf_counter() - start
+        finally:
+            destination.close()
+            source.close()
+
+        report.bytes = os.path.getsize(copy_path)
+        report.throughput_mb_s = report.bytes / 1e6 / copy_seconds if copy_seconds else 0.0
+        if compress:
+            with open(copy_path, "rb") as raw, gzip.open(destination_path, "wb", compresslevel=6) as packed:
+                shutil.copyfileobj(raw, packed, 1024 * 1024)
+            os.remove(copy_path)
+        else:
+            os.replace(copy_path, destination_path)
+    finally:
+        if os.path.exists(copy_path):
+            os.remove(copy_path)
+
+    report.compressed_bytes = os.path.getsize(destination_path)
+    report.seconds = time.perf_counter() - start
+    return report
+
+
+def _decompress(path: str, directory: Optional[str] = None) -> str:
+    """
+    Copy a snapshot, decompressing it if needed, to a temporary file in a directory.
+
+    Returns:
+        str: The path of the copy, to be removed or moved by the caller.
+    """
+    fd, copy_path = tempfile.mkstemp(suffix=".db", dir=directory)
+    opener = gzip.open if path.endswith(".gz") else open
+    try:
+        with os.fdopen(fd, "wb") as raw, opener(path, "rb") as packed:
+            shutil.copyfileobj(packed, raw, 1024 * 1024)
+    except BaseException:
+        os.remove(copy_path)
+        raise
+    return copy_path
+
+
+def _check_database(copy_path: str, label: str) -> int:
+    """
+    Run `PRAGMA integrity_check` on an uncompressed database file and count its URL entries.
+
+    Raises:
+        ValueError: If the file is corrupted or is not a database of this application.
+    """
+    connection = sqlite3.connect(f"file:{copy_path}?mode=ro", uri=True)
+    try:
+        result = connection.execute("PRAGMA integrity_check").fetchone()[0]
+        if result != "ok":
+            raise ValueError(f"Backup '{label}' failed the integrity check: {result}")
+        return connection.execute("SELECT COUNT(*) FROM urls").fetchone()[0]
+    except sqlite3.DatabaseError as error:
+        raise ValueError(f"Backup '{label}' is not a valid database: {error}") from error
+    finally:
+        connection.close()
+
+
+def verify_backup(path: str) -> int:
+    """
+    Check the integrity of a snapshot.
+
+    Args:
+        path (str): The path of the snapshot, compressed or not.
+
+    Returns:
+        int: The number of URL entries in the snapshot.
+
+    Raises:
+        ValueError: If the snapshot is corrupted or is not a database of this application.
+    """
+    if not path.endswith(".gz"):
+        return _check_database(path, path)
+    copy_path = _decompress(path)
+    try:
+        return _check_database(copy_path, path)
+    finally:
+        os.remove(copy_path)
+
+
+def restore_backup(path: str, destination_path: str, overwrite: bool = False) -> int:
+    """
+    Verify a snapshot and restore it to a database file. The application must be stopped.
+
+    The snapshot is decompressed once, next to the destination, and the checked copy then
+    replaces the destination atomically.
+
+    Args:
+        path (str): The path of the snapshot, compressed or not.
+        destination_path (str): The path of the database file to restore.
+        overwrite (bool): Whether an existing database file may be replaced.
+
+    Returns:
+        int: The number of URL entries restored.
+
+    Raises:
+        FileExistsError: If the destination exists and `overwrite` is False.
+        ValueError: If the snapshot fails verification.
+    """
+    if os.path.exists(destination_path) and not overwrite:
+        raise FileExistsError(f"'{destination_path}' already exists")
+    copy_path = _decompress(path, directory=os.path.dirname(os.path.abspath(destination_path)))
+    try:
+        rows = _check_database(copy_path, path)
+        os.replace(copy_path, destination_path)
+    finally:
+        if os.path.exists(copy_path):
+            os.remove(copy_path)
+    for suffix in ("-wal", "-shm", "-journal"):
+        if os.path.exists(destination_path + suffix):
+            os.remove(destination_path + suffix)
+    return rows
+
+
+def _snapshot_prefix(source_path: str) -> str:
+    return os.path.splitext(os.path.basename(source_path))[0] + "-"
+
+
+def list_snapshots(directory: str, source_path: str) -> List[str]:
+    """
+    List the snapshots of a database in a directory, oldest first.
+
+    Args:
+        directory (str): The backup directory.
+        source_path (str): The path of the backed up database.
+
+    Returns:
+        list: The paths of the snapshots.
+    """
+    if not os.path.isdir(directory):
+        return []
+    prefix = _snapshot_prefix(source_path)
+    names = [
+        name for name in os.listdir(directory)
+        if name.startswith(prefix) and name[len(prefix):].split(".", 1)[0].isalnum()
+        and (name.endswith(".db") or name.endswith(".db.gz"))
+    ]
+    return [os.path.join(directory, name) for name in sorted(names)]
+
+
+def apply_retention(directory: str, source_path: str, keep: int) -> List[str]:
+    """
+    Delete the oldest snapshots of a database, keeping the newest `keep` ones.
+
+    Returns:
+        list: The paths of the deleted snapshots.
+    """
+    snapshots = list_snapshots(directory, source_path)
+    expired = snapshots[:-keep] if keep > 0 else snapshots
+    for path in expired:
+        os.remove(path)
+    return expired
+
+
+def snapshot(
+    source_path: str,
+    directory: str,
+    retention: int = 7,
+    compress: bool = True,
+    pages: int = 64,
+    pause: float = 0.005,
+    verify: bool = True,
+) -> BackupReport:
+    """
+    Take a timestamped snapshot of a database, verify it and apply the retention policy.
+
+    Args:
+        source_path (str): The path of the database to back up.
+        directory (str): The backup directory.
+        retention (int): The number of snapshots of this database to keep.
+        compress (bool): Whether the snapshot is gzip-compressed.
+        pages (int): The number of pages copied per step.
+        pause (float): The time in seconds to yield to other connections between steps.
+        verify (bool): Whether the snapshot is checked with `verify_backup`.
+
+    Returns:
+        BackupReport: The measurements of the backup.
+    """
+    stamp = datetime.now(timezone.utc).strftime(SNAPSHOT_TIME_FORMAT)
+    destination = os.path.join(directory, f"{_snapshot_prefix(source_path)}{stamp}.db")
+    report = backup_database(source_path, destination, pages=pages, pause=pause, compress=compress)
+    if verify:
+        verify_backup(report.destination)
+    apply_retention(directory, source_path, retention)
+    logger.info("Backup of %s to %s: %s", source_path, report.destination, report.as_dict())
+    return report
+
+
+class BackupScheduler:
+    """
+    A thread taking snapshots of some databases at a fixed interval, or when asked to.
+
+    Args:
+        source_paths (list): The paths of the databases to back up.
+        interval (float): The time in seconds between two snapshots, 0 to only take the
+            snapshots asked for with `request_run`.
+        **options: The options passed to `snapshot` (directory, retention, compress, ...).
+
+    Attributes:
+        last_reports (list): The reports of the last completed snapshots.
+        last_error (str, optional): Why the last run failed, None if it succeeded.
+        running (bool): Whether snapshots are being taken.
+    """
+
+    def __init__(self, source_paths: List[str], interval: float, **options):
+        self.source_paths = source_paths
+        self.interval = interval
+        self.options = options
+        self.last_reports: List[BackupReport] = []
+        self.last_error: Optional[str] = None
+        self.running = False
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="backup-scheduler", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            thread.join()
+        self._wake.clear()
+
+    def request_run(self):
+        """
+        Ask the scheduler thread to take a snapshot of every database now, starting it if needed.
+
+        A request made while snapshots are being taken starts another run once they are done.
+        """
+        self._wake.set()
+        self.start()
+
+    def run_once(self) -> List[BackupReport]:
+        """
+        Take a snapshot of every database now, in the calling thread.
+
+        Returns:
+            list: The reports of the snapshots.
+        """
+        self.last_reports = [snapshot(path, **self.options) for path in self.source_paths]
+        return self.last_reports
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval if self.interval > 0 else None)
+            if self._stop.is_set():
+                return
+            self._wake.clear()
+            self.running = True
+            try:
+                self.run_once()
+                self.last_error = None
+            except Exception as error:
+                self.last_error = str(error)
+                logger.exception("Scheduled backup failed")
+            finally:
+                self.running = False
+
+
+def main(argv=None):
+    """
+    Command line entry point of the backup tool.
+    """
+    import argparse
+
+    from .config import get_settings
+    from .database import shard_engines
+
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description="Back up, verify and restore the URL databases.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    snapshot_parser = commands.add_parser("snapshot", help="take a snapshot of every shard")
+    snapshot_parser.add_argument("--directory", default=settings.backup_dir)
+    snapshot_parser.add_argument("--retention", type=int, default=settings.backup_retention)
+    snapshot_parser.add_argument("--no-compress", action="store_true")
+    verify_parser = commands.add_parser("verify", help="check a snapshot")
+    verify_parser.add_argument("path")
+    restore_parser = commands.add_parser("restore", help="restore a snapshot (application stopped)")
+    restore_parser.add_argument("path")
+    restore_parser.add_argument("destination")
+    restore_parser.add_argument("--overwrite", action="store_true")
+    args = parser.parse_args(argv)
+
+    if args.command == "snapshot":
+        for engine in shard_engines.values():
+            report = snapshot(
+                sqlite_path(engine),
+                args.directory,
+                retention=args.retention,
+                compress=not args.no_compress,
+                pages=settings.backup_step_pages,
+                pause=settings.backup_step_pause_ms / 1000,
+            )
+            print(report.as_dict())
+    elif args.command == "verify":
+        print(f"{args.path}: ok, {verify_backup(args.path)} URL entries")
+    else:
+        rows = restore_backup(args.path, args.destination, overwrite=args.overwrite)
+        print(f"{args.destination}: restored {rows} URL entries")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,10 +3,15 @@ This module contains the configuration settings for the shortener application.
 It uses the Pydantic library to manage settings and environment variables.
 """
 
+import logging
+from typing import Literal
+
 # pydantic is automatically installed with FastAPI
 from pydantic import BaseSettings
 from functools import lru_cache
 
+logger = logging.getLogger(__name__)
+
 class Settings(BaseSettings):
     """
     Settings class to store application configuration using Pydantic BaseSettings.
@@ -15,10 +20,87 @@ class Settings(BaseSettings):
         env_name (str): The name of the environment (default is "Local").
         base_url (str): The base URL for the application (default is "http://localhost:8000").
         db_url (str): The database URL for the application (default is "sqlite:///./shortener.db").
+        admin_api_key (str): The key operators send in the `X-Admin-Key` header to use the
+            service-wide admin endpoints (default is empty, which disables them).
+        shard_count (int): The number of databases the URL entries are spread over (default is 1).
+        group_commit_enabled (bool): Whether URL creations are committed in groups by a
+            single writer thread (default is False).
+        group_commit_max_delay_ms (float): The maximum latency in milliseconds added to a URL
+            creation while waiting for others to join its group (default is 5.0).
+        group_commit_max_batch (int): The maximum number of URL creations committed together
+            (default is 100).
+        slow_request_threshold_ms (float): The duration in milliseconds above which a request is
+            logged with its SQL statements (default is 500.0, 0 disables it).
+        backup_dir (str): The directory where database snapshots are written (default is "./backups").
+        backup_interval_seconds (float): The time between two scheduled snapshots (default is 0, which
+            disables scheduled snapshots).
+        backup_retention (int): The number of snapshots kept per database (default is 7).
+        backup_compress (bool): Whether snapshots are gzip-compressed (default is True).
+        backup_step_pages (int): The number of pages copied per online backup step (default is 64).
+        backup_step_pause_ms (float): The pause between two backup steps, during which other
+            connections can write (default is 5.0).
+        rate_limit_enabled (bool): Whether per-client rate limiting is applied (default is True).
+        rate_limit_create_rate (float): Tokens per second refilled for `POST /url` (default is 1.0).
+        rate_limit_create_burst (int): Bucket capacity for `POST /url` (default is 20).
+        rate_limit_admin_rate (float): Tokens per second refilled for `/admin/...` calls (default is 2.0).
+        rate_limit_admin_burst (int): Bucket capacity for `/admin/...` calls (default is 20).
+        rate_limit_redirect_rate (float): Tokens per second refilled for redirects and alias
+            checks (default is 20.0).
+        rate_limit_redirect_burst (int): Bucket capacity for redirects and alias checks (default is 100).
+        rate_limit_api_keys (str): Comma-separated API keys whose clients, sending them in the
+            `X-API-Key` header, are limited separately from their IP address (default is empty).
+        link_check_interval_seconds (float): The time between two batches of link-health checks
+            (default is 0, which disables the background checker).
+        link_check_batch_size (int): The maximum number of links checked per batch (default is 500).
+        link_check_recheck_hours (float): The time after which a checked link is due again (default is 24.0).
+        link_check_concurrency (int): The maximum number of checks in flight (default is 20).
+        link_check_per_host_concurrency (int): The maximum number of checks in flight to the same
+            host (default is 2).
+        link_check_per_host_delay_ms (float): The minimum time between two checks of the same
+            host (default is 1000.0).
+        link_check_timeout_seconds (float): The maximum duration of a check (default is 10.0).
+        link_check_allow_private_targets (bool): Whether targets resolving to private, loopback,
+            link-local or reserved addresses are checked; they are refused by default so that
+            the checker cannot reach internal services (default is False).
+        dead_link_failures (int): The number of consecutive failed checks after which a link is
+            considered dead (default is 3).
+        dead_link_policy (Literal["flag", "skip"]): What redirects to dead links do: "flag" adds an
+            `X-Link-Health: dead` header to the redirect, "skip" answers 410 Gone instead
+            (default is "flag").
     """
     env_name: str = "Local"
     base_url: str = "http://localhost:8000"
     db_url: str = "sqlite:///./shortener.db"
+    admin_api_key: str = ""
+    shard_count: int = 1
+    group_commit_enabled: bool = False
+    group_commit_max_delay_ms: float = 5.0
+    group_commit_max_batch: int = 100
+    slow_request_threshold_ms: float = 500.0
+    backup_dir: str = "./backups"
+    backup_interval_seconds: float = 0.0
+    backup_retention: int = 7
+    backup_compress: bool = True
+    backup_step_pages: int = 64
+    backup_step_pause_ms: float = 5.0
+    rate_limit_enabled: bool = True
+    rate_limit_create_rate: float = 1.0
+    rate_limit_create_burst: int = 20
+    rate_limit_admin_rate: float = 2.0
+    rate_limit_admin_burst: int = 20
+    rate_limit_redirect_rate: float = 20.0
+    rate_limit_redirect_burst: int = 100
+    rate_limit_api_keys: str = ""
+    link_check_interval_seconds: float = 0.0
+    link_check_batch_size: int = 500
+    link_check_recheck_hours: float = 24.0
+    link_check_concurrency: int = 20
+    link_check_per_host_concurrency: int = 2
+    link_check_per_host_delay_ms: float = 1000.0
+    link_check_timeout_seconds: float = 10.0
+    link_check_allow_private_targets: bool = False
+    dead_link_failures: int = 3
+    dead_link_policy: Literal["flag", "skip"] = "flag"
 
     class Config:
         env_file = ".env"
@@ -32,5 +114,5 @@ def get_settings() -> Settings:
         Settings: The current settings for the application.
     """
     settings = Settings()
-    print(f"Loading settings for: {settings.env_name}")
+    logger.info("Loading settings for: %s", settings.env_name)
     return settings
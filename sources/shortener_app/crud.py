@@ -1,24 +1,100 @@
 # shortener_app/crud.py
 
+import sys
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import update
+from sqlalchemy.engine import Row
 from sqlalchemy.orm import Session
 from . import keygen, models, schemas
+from .sharding import session_shard_ids
+from .singleflight import SingleFlight
 
-def create_db_url(db: Session, url: schemas.URLBase) -> models.URL:
+# Concurrent redirect lookups of the same key share a single query
+key_lookups = SingleFlight()
+
+# The columns needed to serialize a URL entry, selected instead of loading ORM instances
+URL_INFO_COLUMNS = (
+    models.URL.id,
+    models.URL.key,
+    models.URL.secret_key,
+    models.URL.target_url,
+    models.URL.is_active,
+    models.URL.clicks,
+)
+
+# The number of values bound in one `IN (...)` list, below SQLite's limit of 999 parameters
+BULK_CHUNK_SIZE = 500
+
+# The maximum number of rows the admin listing visits per page to apply the click threshold
+MAX_LISTING_SCAN = 10000
+
+# The outcomes of a bulk deactivation, per secret key
+DEACTIVATED = "deactivated"
+ALREADY_INACTIVE = "already_inactive"
+NOT_FOUND = "not_found"
+
+def build_db_url(url: schemas.URLBase, key: Optional[str] = None) -> models.URL:
     """
-    Create a new URL entry in the database with a random key and secret key.
+    Build a new, not yet saved, URL entry with a random key and secret key.
 
     Parameters:
-    db (Session): The SQLAlchemy database session.
     url (schemas.URLBase): The URL schema object containing the target URL.
+    key (str, optional): A custom alias to use as key instead of a random one.
 
     Returns:
-    models.URL: The newly created URL entry in the database.
+    models.URL: The transient URL entry.
     """
-    key = keygen.create_random_key()
+    if key is None:
+        key = keygen.create_random_key()
     secret_key = keygen.create_random_key(length=8)
-    db_url = models.URL(
+    return models.URL(
         target_url=url.target_url, key=key, secret_key=secret_key
     )
+
+def assign_unique_secret_keys(db: Session, db_urls: List[models.URL]):
+    """
+    Draw new secret keys for new URL entries whose secret key is already used on another shard.
+
+    The unique index on `secret_key` is only enforced within each shard, and entries are placed
+    by their short key, so two entries on different shards could get the same secret key. With
+    several shards, the secret keys of new entries are therefore looked up on every shard (one
+    `IN (...)` query per chunk) before they are inserted. With a single database, the unique
+    index is enough and nothing is queried.
+
+    Parameters:
+    db (Session): The SQLAlchemy database session.
+    db_urls (list): The transient URL entries, see `build_db_url`.
+    """
+    if len(session_shard_ids(db)) == 1:
+        return
+    pending = list(db_urls)
+    kept = set()
+    while pending:
+        taken = set(get_db_urls_by_secret_keys(db, [db_url.secret_key for db_url in pending]))
+        conflicting = []
+        for db_url in pending:
+            if db_url.secret_key in taken or db_url.secret_key in kept:
+                db_url.secret_key = keygen.create_random_key(length=8)
+                conflicting.append(db_url)
+            else:
+                kept.add(db_url.secret_key)
+        pending = conflicting
+
+def create_db_url(db: Session, url: schemas.URLBase, key: Optional[str] = None) -> models.URL:
+    """
+    Create a new URL entry in the database with a random key and secret key.
+
+    Parameters:
+    db (Session): The SQLAlchemy database session.
+    url (schemas.URLBase): The URL schema object containing the target URL.
+    key (str, optional): A custom alias to use as key instead of a random one.
+
+    Returns:
+    models.URL: The newly created URL entry in the database.
+    """
+    db_url = build_db_url(url, key=key)
+    assign_unique_secret_keys(db, [db_url])
     db.add(db_url)
     db.commit()
     db.refresh(db_url)
@@ -41,6 +117,46 @@ def get_db_url_by_key(db: Session, url_key: str) -> models.URL:
         .first()
     )
 
+def get_redirect_by_key(db: Session, url_key: str) -> Optional[Row]:
+    """
+    Retrieve the redirect target of an active URL entry by its key.
+
+    Concurrent calls for the same key are coalesced: only one of them queries the database
+    and all of them receive its result. The result is a detached row of column values, so it
+    can safely be shared between requests using different sessions.
+
+    Parameters:
+    db (Session): The SQLAlchemy database session, used if this call runs the query.
+    url_key (str): The key of the URL entry to retrieve.
+
+    Returns:
+    Row: A row with the `target_url` and the `check_failures` of the URL entry if found and active,
+    otherwise None. The link health comes with the target, so flagging dead links costs no query.
+    """
+    return key_lookups.do(
+        url_key,
+        lambda: (
+            db.query(models.URL.target_url, models.URL.check_failures)
+            .filter(models.URL.key == url_key, models.URL.is_active)
+            .first()
+        ),
+    )
+
+def is_key_available(db: Session, key: str) -> bool:
+    """
+    Check whether a key is free, with a single probe on the unique index of `urls.key`.
+
+    Deactivated URL entries keep their key, so they are taken into account as well.
+
+    Parameters:
+    db (Session): The SQLAlchemy database session.
+    key (str): The key to check.
+
+    Returns:
+    bool: True if no URL entry uses the key.
+    """
+    return db.query(models.URL.id).filter(models.URL.key == key).first() is None
+
 def get_db_url_by_secret_key(db: Session, secret_key: str) -> models.URL:
     """
     Retrieve a URL entry from the database by its secret key.
@@ -85,6 +201,22 @@ def update_db_clicks(db: Session, db_url: schemas.URL) -> models.URL:
     db.refresh(db_url)
     return db_url
 
+def increment_db_clicks_by_key(db: Session, url_key: str) -> None:
+    """
+    Increment the click count of a URL entry by its key, without loading it.
+
+    The increment is done in SQL (`clicks = clicks + 1`), so concurrent clicks are not lost
+    and no ORM instance is needed, which lets redirects share a coalesced lookup.
+
+    Args:
+        db (Session): The SQLAlchemy database session.
+        url_key (str): The key of the URL entry that was clicked.
+    """
+    db.query(models.URL).filter(models.URL.key == url_key).update(
+        {models.URL.clicks: models.URL.clicks + 1}, synchronize_session=False
+    )
+    db.commit()
+
 def deactivate_db_url_by_secret_key(db: Session, secret_key: str) -> models.URL:
     """
     Deactivates a URL entry in the database by setting its `is_active` status to `False`.
@@ -108,6 +240,316 @@ def deactivate_db_url_by_secret_key(db: Session, secret_key: str) -> models.URL:
         db_url.is_active = False
         db.commit()
         db.refresh(db_url)
+        # A redirect lookup started before the commit must not be shared with later requests
+        key_lookups.forget([db_url.key])
 
     return db_url
 
+def _chunks(values: List[str]) -> Iterable[List[str]]:
+    for start in range(0, len(values), BULK_CHUNK_SIZE):
+        yield values[start:start + BULK_CHUNK_SIZE]
+
+def get_db_urls_by_secret_keys(db: Session, secret_keys: Iterable[str]) -> Dict[str, Row]:
+    """
+    Retrieve many URL entries, active or not, by their secret keys.
+
+    The entries are selected with one `secret_key IN (...)` query per chunk of
+    `BULK_CHUNK_SIZE` keys, instead of one query per key.
+
+    Args:
+        db (Session): The SQLAlchemy database session.
+        secret_keys (iterable): The secret keys of the URL entries to retrieve.
+
+    Returns:
+        dict: The rows found (see `URL_INFO_COLUMNS`), by secret key. Unknown secret keys are absent.
+    """
+    found = {}
+    for chunk in _chunks(list(dict.fromkeys(secret_keys))):
+        for row in db.query(*URL_INFO_COLUMNS).filter(models.URL.secret_key.in_(chunk)):
+            found[row.secret_key] = row
+    return found
+
+def deactivate_db_urls_by_secret_keys(db: Session, secret_keys: Iterable[str]) -> Dict[str, str]:
+    """
+    Deactivate many URL entries by their secret keys, in a single transaction.
+
+    The entries are looked up and deactivated with set-based statements, one
+    `secret_key IN (...)` SELECT and UPDATE per chunk of `BULK_CHUNK_SIZE` keys, and committed
+    once. Redirect lookups in flight for the deactivated keys are then forgotten in one pass.
+    With several shards, each shard commits its own transaction.
+
+    Args:
+        db (Session): The SQLAlchemy database session.
+        secret_keys (iterable): The secret keys of the URL entries to deactivate.
+
+    Returns:
+        dict: The outcome for each distinct secret key, in the order given: `DEACTIVATED`,
+            `ALREADY_INACTIVE` or `NOT_FOUND`.
+    """
+    secret_keys = list(dict.fromkeys(secret_keys))
+    outcomes = dict.fromkeys(secret_keys, NOT_FOUND)
+    deactivated_keys = []
+    for chunk in _chunks(secret_keys):
+        rows = (
+            db.query(models.URL.key, models.URL.secret_key, models.URL.is_active)
+            .filter(models.URL.secret_key.in_(chunk))
+            .all()
+        )
+        active = [row.secret_key for row in rows if row.is_active]
+        for row in rows:
+            outcomes[row.secret_key] = DEACTIVATED if row.is_active else ALREADY_INACTIVE
+            if row.is_active:
+                deactivated_keys.append(row.key)
+        if active:
+            db.query(models.URL).filter(models.URL.secret_key.in_(active), models.URL.is_active).update(
+                {models.URL.is_active: False}, synchronize_session=False
+            )
+    db.commit()
+    # Redirect lookups started before the commit must not be shared with later requests
+    key_lookups.forget(deactivated_keys)
+    return outcomes
+
+def deactivate_db_urls_by_domain(
+    db: Session, domain: str, include_subdomains: bool = False, limit: int = schemas.MAX_BULK_ITEMS
+) -> Tuple[Dict[str, str], bool]:
+    """
+    Deactivate the active URL entries pointing to a target domain, in a single transaction.
+
+    On each shard, one SELECT reads the oldest `limit` matching entries, and one UPDATE with the
+    same criteria, bounded by the largest id read, deactivates exactly those entries. Entries
+    created meanwhile are left for the next call. An exact domain match is answered by the
+    `(target_domain, is_active, id)` index; matching subdomains as well (`*.domain`) needs a
+    scan of the table.
+
+    Args:
+        db (Session): The SQLAlchemy database session.
+        domain (str): The target domain, e.g. "example.com".
+        include_subdomains (bool): Also deactivate the entries pointing to subdomains of `domain`.
+        limit (int): The maximum number of entries deactivated by this call.
+
+    Returns:
+        tuple: The outcome (`DEACTIVATED`) for the secret key of each deactivated entry, and
+            whether matching entries remain active, to be deactivated by another call.
+    """
+    domain = domain.lower()
+    criteria = models.URL.target_domain == domain
+    if include_subdomains:
+        criteria = criteria | models.URL.target_domain.endswith("." + domain, autoescape=True)
+
+    outcomes: Dict[str, str] = {}
+    deactivated_keys = []
+    more = False
+    for shard_id in session_shard_ids(db):
+        query = db.query(models.URL).filter(criteria, models.URL.is_active == True)  # noqa: E712
+        if shard_id is not None:
+            query = query.set_shard(shard_id)
+        # One extra row tells whether entries remain after this call
+        wanted = limit - len(outcomes)
+        rows = (
+            query.with_entities(models.URL.id, models.URL.key, models.URL.secret_key)
+            .order_by(models.URL.id)
+            .limit(wanted + 1)
+            .all()
+        )
+        more = more or len(rows) > wanted
+        rows = rows[:wanted]
+        if rows:
+            # Query.update() ignores set_shard(): the shard is passed to the session directly
+            statement = (
+                update(models.URL)
+                .where(criteria, models.URL.is_active == True, models.URL.id <= rows[-1].id)  # noqa: E712
+                .values(is_active=False)
+                .execution_options(synchronize_session=False)
+            )
+            db.execute(statement, bind_arguments={} if shard_id is None else {"shard_id": shard_id})
+            for row in rows:
+                outcomes[row.secret_key] = DEACTIVATED
+                deactivated_keys.append(row.key)
+    db.commit()
+    # Redirect lookups started before the commit must not be shared with later requests
+    key_lookups.forget(deactivated_keys)
+    return outcomes, more
+
+def get_links_due_for_check(db: Session, checked_before: datetime, limit: int) -> List[Row]:
+    """
+    Select the active URL entries whose target is due for a health check, most clicked first.
+
+    Entries never checked, or last checked before `checked_before`, are due. The query walks
+    the `(is_active, clicks)` index by decreasing clicks and stops after `limit` due entries.
+
+    Args:
+        db (Session): The SQLAlchemy database session.
+        checked_before (datetime): Entries checked at or after this time (UTC) are not due.
+        limit (int): The maximum number of entries returned.
+
+    Returns:
+        list: Rows with the `key`, `target_url` and `clicks` of the entries, by decreasing clicks.
+    """
+    rows = (
+        db.query(models.URL.key, models.URL.target_url, models.URL.clicks)
+        .filter(
+            models.URL.is_active == True,  # noqa: E712
+            models.URL.last_checked_at.is_(None) | (models.URL.last_checked_at < checked_before),
+        )
+        .order_by(models.URL.clicks.desc())
+        .limit(limit)
+        .all()
+    )
+    # With several shards, the rows of each shard come one after the other
+    return sorted(rows, key=lambda row: row.clicks or 0, reverse=True)[:limit]
+
+def record_link_checks(db: Session, statuses: Dict[str, int], failed: Iterable[str], checked_at: datetime) -> None:
+    """
+    Record the outcome of health checks, in a single transaction.
+
+    Entries with the same outcome are updated together, one `key IN (...)` UPDATE per chunk of
+    `BULK_CHUNK_SIZE` keys. A failed check increments `check_failures`, a successful one resets it.
+
+    Args:
+        db (Session): The SQLAlchemy database session.
+        statuses (dict): The HTTP status of each checked entry by key, 0 when the target did not answer.
+        failed (iterable): The keys whose check failed.
+        checked_at (datetime): The time of the checks (UTC).
+    """
+    failed = set(failed)
+    groups: Dict[Tuple[int, bool], List[str]] = {}
+    for key, status in statuses.items():
+        groups.setdefault((status, key in failed), []).append(key)
+    for (status, is_failure), keys in groups.items():
+        values = {
+            models.URL.last_status: status,
+            models.URL.last_checked_at: checked_at,
+            models.URL.check_failures: models.URL.check_failures + 1 if is_failure else 0,
+        }
+        for chunk in _chunks(keys):
+            db.query(models.URL).filter(models.URL.key.in_(chunk)).update(values, synchronize_session=False)
+    db.commit()
+
+def _prefix_upper_bound(prefix: str) -> Optional[str]:
+    """
+    Return the smallest string greater than every string starting with `prefix`, or None if there is none.
+    """
+    stripped = prefix.rstrip(chr(sys.maxunicode))
+    if not stripped:
+        return None
+    return stripped[:-1] + chr(ord(stripped[-1]) + 1)
+
+def _listing_cursor(shard_id: Optional[str], row: Row, by_domain: bool) -> str:
+    cursor = f"{shard_id or '0'}:{row.id}"
+    return f"{cursor}:{row.target_domain}" if by_domain else cursor
+
+def _listing_ranges(prefix: Optional[str], after: Optional[Tuple]) -> List[list]:
+    """
+    Return the criteria of the index ranges listed after a position, in the order of the listing.
+
+    SQLite only seeks on the first column of a row value comparison, so the position
+    `(target_domain, id) > (domain, id)` is split into two ranges: the rest of the domain,
+    then the following domains.
+    """
+    if not prefix:
+        return [[models.URL.id > after[0]]] if after else [[]]
+    upper_bound = _prefix_upper_bound(prefix)
+    following = [models.URL.target_domain < upper_bound] if upper_bound is not None else []
+    if not after:
+        return [[models.URL.target_domain >= prefix] + following]
+    last_domain, last_id = after
+    return [
+        [models.URL.target_domain == last_domain, models.URL.id > last_id],
+        [models.URL.target_domain > last_domain] + following,
+    ]
+
+def list_db_urls(
+    db: Session,
+    cursor: Optional[str] = None,
+    limit: int = 100,
+    is_active: Optional[bool] = None,
+    min_clicks: Optional[int] = None,
+    domain: Optional[str] = None,
+) -> Tuple[List[Row], Optional[str]]:
+    """
+    List URL entries one page at a time, with keyset pagination.
+
+    Each page continues after the last entry of the previous page instead of skipping rows
+    with an offset, so its cost does not grow with its depth. Without a domain, entries are
+    listed by id (`id > ?`), served by the primary key or the `(is_active, id)` index. With a
+    domain prefix, they are listed by target domain then id, within `prefix <= target_domain
+    < upper bound`, served by the `(target_domain, id)` or `(is_active, target_domain, id)`
+    index. With several shards, the shards are listed one after the other, each in that order,
+    so the listing is not in creation order overall.
+
+    The click threshold is not indexed: it is checked on the rows visited, and at most
+    `MAX_LISTING_SCAN` rows are visited per page. A page may therefore hold fewer than `limit`
+    entries, or none, while its `next_cursor` is set; the listing continues from there.
+
+    Args:
+        db (Session): The SQLAlchemy database session.
+        cursor (str, optional): The `next_cursor` of the previous page, or None for the first page.
+        limit (int): The maximum number of entries in the page.
+        is_active (bool, optional): Only list active (True) or inactive (False) entries.
+        min_clicks (int, optional): Only list entries clicked at least this many times.
+        domain (str, optional): Only list entries whose target domain starts with this prefix.
+
+    Returns:
+        tuple: The rows of the page (see `URL_INFO_COLUMNS`, with `target_domain`) and the
+            cursor of the next page, or None if this is the last page.
+
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    shard_ids = session_shard_ids(db)
+    prefix = domain.lower() if domain else None
+    order = [models.URL.target_domain, models.URL.id] if prefix else [models.URL.id]
+
+    position, after = 0, None
+    if cursor:
+        shard, _, rest = cursor.partition(":")
+        last_id, separator, last_domain = rest.partition(":")
+        labels = [shard_id or "0" for shard_id in shard_ids]
+        if shard not in labels or not last_id.isdigit() or bool(separator) != bool(prefix):
+            raise ValueError(f"Invalid cursor '{cursor}'")
+        position, after = labels.index(shard), (last_domain, int(last_id)) if prefix else (int(last_id),)
+
+    rows: List[Row] = []
+    # The rows the click threshold may still visit for this page
+    scan_budget = MAX_LISTING_SCAN
+    for position in range(position, len(shard_ids)):
+        shard_id = shard_ids[position]
+        query = db.query(*URL_INFO_COLUMNS, models.URL.target_domain)
+        if is_active is not None:
+            query = query.filter(models.URL.is_active == is_active)
+        wanted = limit - len(rows)
+        # Without a click threshold, one extra row tells whether this shard has more entries
+        budget = wanted + 1 if min_clicks is None else scan_budget
+        matches: List[Row] = []
+        last_visited = None
+        for criteria in _listing_ranges(prefix, after):
+            if len(matches) > wanted or budget == 0:
+                break
+            # The rows are streamed, so that the scan stops as soon as the page is full
+            result = db.execute(
+                query.filter(*criteria).order_by(*order).limit(budget).statement,
+                bind_arguments={} if shard_id is None else {"shard_id": shard_id},
+                execution_options={"yield_per": min(budget, 1000)},
+            )
+            try:
+                for row in result:
+                    budget -= 1
+                    last_visited = row
+                    if min_clicks is None or row.clicks >= min_clicks:
+                        matches.append(row)
+                        if len(matches) > wanted:
+                            break
+            finally:
+                result.close()
+        truncated = min_clicks is not None and budget == 0
+        if min_clicks is not None:
+            scan_budget = budget
+        rows.extend(matches[:wanted])
+        if len(rows) == limit:
+            if len(matches) > wanted or truncated or position + 1 < len(shard_ids):
+                return rows, _listing_cursor(shard_id, rows[-1], bool(prefix))
+            return rows, None
+        if truncated:
+            return rows, _listing_cursor(shard_id, last_visited, bool(prefix))
+        after = None
+    return rows, None
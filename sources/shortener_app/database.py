@@ -1,36 +1,52 @@
 """
 This module sets up the database configuration for the URL shortener application.
 
-It includes the creation of the SQLAlchemy engine, session maker, and base class for ORM models.
+It includes the creation of the SQLAlchemy engine, session maker, and base class for ORM models,
+as well as the `init_db` migration step that brings the database schema up to date.
+
+The schema can be migrated without starting the application with:
+    python -m shortener_app.migrate
 """
 
-from sqlalchemy import create_engine
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import create_engine, inspect
+from sqlalchemy.orm import declarative_base, sessionmaker
 
 from .config import get_settings
+from .sharding import create_shard_engines, create_sharded_sessionmaker
 
-# Retrieve the database URL from the settings
+# Retrieve the database URL and the number of shards from the settings
 db_url = get_settings().db_url
+shard_count = get_settings().shard_count
 
-# Create a SQLAlchemy engine with the retrieved database URL
-# 'connect_args={"check_same_thread": False}' is specific to SQLite and allows multithreading
-engine = create_engine(db_url, connect_args={"check_same_thread": False})
+if shard_count > 1:
+    # One engine per shard, each on its own database derived from db_url
+    shard_engines = create_shard_engines(db_url, shard_count)
+    engine = shard_engines["0"]
+else:
+    # Create a SQLAlchemy engine with the retrieved database URL
+    # 'connect_args={"check_same_thread": False}' is specific to SQLite and allows multithreading
+    engine = create_engine(db_url, connect_args={"check_same_thread": False})
+    shard_engines = {"0": engine}
 """
 SQLAlchemy engine for connecting to the database.
 
 The engine is configured with the database URL from the settings and 
-connect_args for SQLite to allow multithreading.
+connect_args for SQLite to allow multithreading. When the database is sharded,
+this is the engine of the first shard and `shard_engines` holds all of them.
 """
 
 # Create a configured "Session" class
 # This session factory will be used to create new session objects when interacting with the database
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+if shard_count > 1:
+    SessionLocal = create_sharded_sessionmaker(shard_engines)
+else:
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 """
 SQLAlchemy session factory for creating database sessions.
 
 The session factory is configured with the engine, and the sessions do not 
-autocommit or autoflush by default.
+autocommit or autoflush by default. When the database is sharded, it creates
+`ShardedSession` objects routing each URL entry to its shard.
 """
 
 # Create a base class for declarative class definitions
@@ -41,3 +57,44 @@ Base class for SQLAlchemy ORM models.
 
 All ORM models should inherit from this base class.
 """
+
+
+def init_db(bind=None):
+    """
+    Create the missing tables, columns and indexes of the ORM models.
+
+    `Base.metadata.create_all` only creates tables that do not exist yet. Columns and indexes
+    added to a model afterwards are created here with `ALTER TABLE ... ADD COLUMN` and
+    `CREATE INDEX`, so an existing database keeps working after an upgrade. Derived columns
+    are then backfilled in batches, each in its own transaction.
+
+    Args:
+        bind (Engine, optional): The engine to migrate. Defaults to every shard of the application.
+    """
+    # Importing the models registers their tables on Base.metadata
+    from . import models
+
+    if bind is None:
+        for shard_engine in shard_engines.values():
+            init_db(bind=shard_engine)
+        return
+
+    Base.metadata.create_all(bind=bind)
+
+    inspector = inspect(bind)
+    with bind.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                column_type = column.type.compile(dialect=bind.dialect)
+                ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"
+                if column.server_default is not None:
+                    ddl += f" DEFAULT {column.server_default.arg}"
+                connection.exec_driver_sql(ddl)
+            for index in table.indexes:
+                index.create(bind=connection, checkfirst=True)
+    # Derived columns are filled in for the rows created before them, after the schema
+    # changes are committed and one batch per transaction (served by an index when done)
+    models.backfill_target_domains(bind)
@@ -0,0 +1,209 @@
+"""
+This module implements group commit for URL creation.
+
+Committing each new URL entry in its own transaction makes the SQLite writer spend most of
+its time syncing tiny transactions to disk. `GroupCommitWriter` queues the new entries of
+concurrent requests, and a single writer thread inserts them and commits them together once
+the oldest one has waited `max_delay` seconds or `max_batch` entries are queued. Each request
+blocks on a future resolved with its row once the shared transaction is committed; a request
+giving up cancels its future, and the writer skips the cancelled entries it has not started.
+"""
+
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from . import crud, models
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class GroupCommitWriter:
+    """
+    A writer thread committing queued URL entries in batches.
+
+    The thread is started on the first submission and runs until `stop` is called.
+
+    Args:
+        session_factory (callable): The session factory used by the writer thread.
+        max_delay (float): The maximum time in seconds an entry waits for others to join its batch.
+        max_batch (int): The maximum number of entries committed together.
+        timeout (float): The maximum time in seconds `create` waits for its entry to be committed.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[..., Session],
+        max_delay: float = 0.005,
+        max_batch: int = 100,
+        timeout: float = 30.0,
+    ):
+        self.session_factory = session_factory
+        self.max_delay = max_delay
+        self.max_batch = max_batch
+        self.timeout = timeout
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._batches = 0
+        self._rows = 0
+        self._max_batch_size = 0
+        self._histogram: Dict[int, int] = {}
+
+    def submit(self, db_url: models.URL) -> Future:
+        """
+        Queue a new URL entry for insertion.
+
+        Args:
+            db_url (models.URL): A transient URL entry, see `crud.build_db_url`.
+
+        Returns:
+            Future: Resolved with the committed (detached) entry, or with the exception
+                raised while inserting it, e.g. `IntegrityError` for a duplicate key.
+        """
+        future: Future = Future()
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="group-commit-writer", daemon=True)
+                self._thread.start()
+        self._queue.put((db_url, future))
+        return future
+
+    def create(self, db_url: models.URL) -> models.URL:
+        """
+        Insert a new URL entry and wait until the batch containing it is committed.
+
+        Args:
+            db_url (models.URL): A transient URL entry, see `crud.build_db_url`.
+
+        Returns:
+            models.URL: The committed entry, with its id and defaults loaded.
+
+        Raises:
+            concurrent.futures.TimeoutError: If the writer did not start inserting the entry within
+                `timeout` seconds. The entry is then withdrawn and never inserted.
+        """
+        future = self.submit(db_url)
+        try:
+            return future.result(self.timeout)
+        except TimeoutError:
+            if future.cancel():
+                raise
+        # The writer took the entry just as the wait expired: its commit is under way
+        return future.result()
+
+    def stop(self, timeout: Optional[float] = None):
+        """
+        Commit the entries already queued, then stop the writer thread.
+
+        Args:
+            timeout (float, optional): The maximum time to wait for the thread to finish.
+        """
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is not None and thread.is_alive():
+            self._queue.put(_STOP)
+            thread.join(timeout)
+
+    def stats(self) -> dict:
+        """
+        Report the batch sizes achieved so far.
+
+        Returns:
+            dict: The number of batches and rows committed, the mean and maximum batch size,
+                and a histogram of batch sizes keyed by power-of-two upper bound ("1", "2", "4", ...).
+        """
+        with self._lock:
+            return {
+                "batches": self._batches,
+                "rows": self._rows,
+                "mean_batch_size": self._rows / self._batches if self._batches else 0.0,
+                "max_batch_size": self._max_batch_size,
+                "batch_size_histogram": {str(bound): count for bound, count in sorted(self._histogram.items())},
+            }
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            batch = [item]
+            deadline = time.monotonic() + self.max_delay
+            stop = False
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+            try:
+                self._commit(batch)
+            except Exception as error:
+                # Keep the writer alive (e.g. after a broken connection) and fail the whole batch
+                logger.exception("Group commit of %d entries failed", len(batch))
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(error)
+            if stop:
+                return
+
+    def _commit(self, batch: List[Tuple[models.URL, Future]]):
+        # Skip the entries whose request gave up waiting, and keep the others from being cancelled
+        batch = [(db_url, future) for db_url, future in batch if future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        session = self.session_factory(expire_on_commit=False)
+        try:
+            try:
+                crud.assign_unique_secret_keys(session, [db_url for db_url, _ in batch])
+                session.add_all([db_url for db_url, _ in batch])
+                session.commit()
+            except IntegrityError:
+                # One entry conflicts (e.g. a taken alias): retry them one by one so that
+                # only the conflicting requests fail
+                session.rollback()
+                for db_url, future in batch:
+                    try:
+                        session.add(db_url)
+                        session.commit()
+                        # Detach it so a later rollback in this loop does not expire it
+                        session.expunge(db_url)
+                    except Exception as error:
+                        session.rollback()
+                        future.set_exception(error)
+                    else:
+                        # Each entry was committed on its own: record a batch of one
+                        self._record(1)
+                        future.set_result(db_url)
+                return
+        finally:
+            session.close()
+
+        self._record(len(batch))
+        for db_url, future in batch:
+            future.set_result(db_url)
+
+    def _record(self, size: int):
+        if not size:
+            return
+        bound = 1
+        while bound < size:
+            bound *= 2
+        with self._lock:
+            self._batches += 1
+            self._rows += size
+            self._max_batch_size = max(self._max_batch_size, size)
+            self._histogram[bound] = self._histogram.get(bound, 0) + 1
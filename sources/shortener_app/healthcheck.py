@@ -0,0 +1,451 @@
+"""
+This module checks in the background that the target URLs of the shortened links still answer.
+
+`LinkClient` is a small asyncio HTTP/1.1 client built on `asyncio.open_connection`, so it
+needs no dependency. It sends `HEAD` requests (falling back to `GET` when a server refuses
+`HEAD`) and is polite to the servers it visits:
+- at most `concurrency` requests are in flight overall, and `per_host_concurrency` per host;
+- two requests to the same host start at least `per_host_delay` seconds apart;
+- keep-alive connections are reused for the following requests to the same host.
+
+Target URLs are supplied by users, so the client resolves each host itself and refuses the
+ones resolving to private, loopback, link-local or reserved addresses (such as the cloud
+metadata endpoint 169.254.169.254), then connects to the checked address: the checker cannot
+be used to reach internal services, even through a DNS record changed between two lookups.
+
+`LinkHealthChecker` checks the due links in batches, most clicked first, and records the
+status, the check time and the number of consecutive failures of each link in the `urls`
+table. The redirect endpoint reads the failure count along with the target URL, so dead
+links can be flagged or refused without an extra query.
+"""
+
+import asyncio
+import ipaddress
+import logging
+import socket
+import ssl
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import quote, urlsplit
+
+from sqlalchemy.orm import Session
+
+from . import crud
+
+logger = logging.getLogger(__name__)
+
+USER_AGENT = "url-shortener-link-checker/1.0"
+
+# Response bodies larger than this are not read: the connection is closed instead of reused
+MAX_DRAINED_BODY = 64 * 1024
+
+# The statuses of targets that are gone or broken; other statuses (redirects, 401, 403,
+# 429, ...) show that the target still resolves
+FAILED_STATUSES = {404, 410}
+
+
+def is_public_address(address: str) -> bool:
+    """
+    Tell whether an IP address may be checked, i.e. whether it is reachable on the internet.
+
+    Args:
+        address (str): An IPv4 or IPv6 address.
+
+    Returns:
+        bool: False for private, loopback, link-local, reserved, multicast and unspecified
+            addresses, including IPv4 addresses mapped into IPv6.
+    """
+    ip = ipaddress.ip_address(address.split("%", 1)[0])
+    if ip.version == 6 and ip.ipv4_mapped is not None:
+        ip = ip.ipv4_mapped
+    return ip.is_global and not ip.is_multicast
+
+
+def is_failure(status: int) -> bool:
+    """
+    Tell whether a check status counts as a failure of the link.
+
+    Args:
+        status (int): The HTTP status of the check, 0 when the target did not answer.
+
+    Returns:
+        bool: True when the target did not answer, is gone, or failed with a server error.
+    """
+    return status == 0 or status >= 500 or status in FAILED_STATUSES
+
+
+@dataclass
+class CheckResult:
+    """
+    The outcome of the check of one target URL.
+
+    Attributes:
+        url (str): The target URL.
+        status (int): The HTTP status of the response, 0 when the target did not answer.
+        seconds (float): The duration of the check, including the politeness delays.
+        error (str, optional): Why the target did not answer.
+    """
+
+    url: str
+    status: int
+    seconds: float
+    error: Optional[str] = None
+
+    @property
+    def failed(self) -> bool:
+        return is_failure(self.status)
+
+
+class _Host:
+    """
+    The connections and politeness state of one host (scheme, host name and port).
+    """
+
+    def __init__(self, per_host_concurrency: int):
+        self.semaphore = asyncio.Semaphore(per_host_concurrency)
+        self.turn = asyncio.Lock()
+        self.next_request_at = 0.0
+        self.idle: List[Tuple[asyncio.StreamReader, asyncio.StreamWriter]] = []
+
+    async def wait_turn(self, delay: float):
+        async with self.turn:
+            now = time.monotonic()
+            if self.next_request_at > now:
+                await asyncio.sleep(self.next_request_at - now)
+            self.next_request_at = max(now, self.next_request_at) + delay
+
+
+class LinkClient:
+    """
+    A polite asyncio HTTP client checking target URLs, reusing connections per host.
+
+    It must be created and used within a running event loop, preferably as an async context
+    manager so that its idle connections are closed.
+
+    Args:
+        concurrency (int): The maximum number of requests in flight.
+        per_host_concurrency (int): The maximum number of requests in flight to the same host.
+        per_host_delay (float): The minimum time in seconds between two requests to the same host.
+        timeout (float): The maximum duration in seconds of a request.
+        ssl_context (ssl.SSLContext, optional): The TLS settings of HTTPS connections.
+        allow_private (bool): Also check the hosts resolving to non-public addresses (see
+            `is_public_address`), e.g. test servers on the loopback interface.
+
+    Attributes:
+        connections_opened (int): The number of connections opened so far.
+        requests (int): The number of requests sent so far.
+    """
+
+    def __init__(
+        self,
+        concurrency: int = 20,
+        per_host_concurrency: int = 2,
+        per_host_delay: float = 1.0,
+        timeout: float = 10.0,
+        ssl_context: Optional[ssl.SSLContext] = None,
+        allow_private: bool = False,
+    ):
+        self.per_host_concurrency = per_host_concurrency
+        self.per_host_delay = per_host_delay
+        self.timeout = timeout
+        self.ssl_context = ssl_context
+        self.allow_private = allow_private
+        self.connections_opened = 0
+        self.requests = 0
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._hosts: Dict[Tuple[str, str, int], _Host] = {}
+
+    async def __aenter__(self) -> "LinkClient":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        """
+        Close the idle connections.
+        """
+        for host in self._hosts.values():
+            while host.idle:
+                _, writer = host.idle.pop()
+                writer.close()
+
+    async def check(self, url: str) -> CheckResult:
+        """
+        Check that a target URL answers.
+
+        Args:
+            url (str): The target URL, with an http or https scheme.
+
+        Returns:
+            CheckResult: The status of the response, or 0 with the error if there was none.
+        """
+        start = time.monotonic()
+        try:
+            parts = urlsplit(url)
+            if parts.scheme not in ("http", "https") or not parts.hostname:
+                raise ValueError(f"Unsupported URL '{url}'")
+            origin = (parts.scheme, parts.hostname, parts.port or (443 if parts.scheme == "https" else 80))
+            host_header = parts.netloc.rpartition("@")[2]
+            target = quote(parts.path or "/", safe="/%:@!$&'()*+,;=~-._")
+            if parts.query:
+                target += "?" + quote(parts.query, safe="/%:@!$&'()*+,;=~-._?")
+        except ValueError as error:
+            return CheckResult(url, 0, time.monotonic() - start, str(error))
+
+        host = self._hosts.get(origin)
+        if host is None:
+            host = self._hosts[origin] = _Host(self.per_host_concurrency)
+        try:
+            async with host.semaphore:
+                status = await self._polite_request(host, origin, host_header, "HEAD", target)
+                if status in (405, 501):
+                    status = await self._polite_request(host, origin, host_header, "GET", target)
+        except (OSError, EOFError, ValueError, asyncio.TimeoutError) as error:
+            return CheckResult(url, 0, time.monotonic() - start, str(error) or type(error).__name__)
+        return CheckResult(url, status, time.monotonic() - start)
+
+    async def _polite_request(self, host: _Host, origin, host_header: str, method: str, target: str) -> int:
+        await host.wait_turn(self.per_host_delay)
+        async with self._semaphore:
+            return await asyncio.wait_for(self._request(host, origin, host_header, method, target), self.timeout)
+
+    async def _request(self, host: _Host, origin, host_header: str, method: str, target: str) -> int:
+        request = (
+            f"{method} {target} HTTP/1.1\r\n"
+            f"Host: {host_header}\r\n"
+            f"User-Agent: {USER_AGENT}\r\n"
+            "Accept: */*\r\n"
+            "\r\n"
+        ).encode("latin-1")
+        while True:
+            reused = bool(host.idle)
+            reader, writer = host.idle.pop() if reused else await self._connect(origin)
+            try:
+                writer.write(request)
+                await writer.drain()
+                self.requests += 1
+                status, keep_alive = await self._read_response(reader, method)
+            except (ConnectionError, EOFError):
+                writer.close()
+                # The server may have closed an idle connection: retry once on a new one
+                if reused:
+                    continue
+                raise
+            except BaseException:
+                writer.close()
+                raise
+            if keep_alive:
+                host.idle.append((reader, writer))
+            else:
+                writer.close()
+            return status
+
+    async def _connect(self, origin) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        scheme, hostname, port = origin
+        address = await self._resolve(hostname, port)
+        if scheme == "https":
+            context = self.ssl_context or ssl.create_default_context()
+            connection = await asyncio.open_connection(address, port, ssl=context, server_hostname=hostname)
+        else:
+            connection = await asyncio.open_connection(address, port)
+        self.connections_opened += 1
+        return connection
+
+    async def _resolve(self, hostname: str, port: int) -> str:
+        """
+        Resolve a host name, refusing it when any of its addresses is not public.
+
+        Returns:
+            str: The address to connect to.
+        """
+        infos = await asyncio.get_running_loop().getaddrinfo(hostname, port, type=socket.SOCK_STREAM)
+        addresses = [info[4][0] for info in infos]
+        if not addresses:
+            raise OSError(f"No address for '{hostname}'")
+        if not self.allow_private:
+            refused = [address for address in addresses if not is_public_address(address)]
+            if refused:
+                raise ValueError(f"Refused non-public address {refused[0]} for '{hostname}'")
+        return addresses[0]
+
+    @staticmethod
+    async def _read_response(reader: asyncio.StreamReader, method: str) -> Tuple[int, bool]:
+        """
+        Read a response, draining its body when it is small enough to keep the connection.
+
+        Returns:
+            tuple: The status of the response, and whether the connection can be reused.
+        """
+        status_line = await reader.readline()
+        if not status_line:
+            raise EOFError("Connection closed by the server")
+        version, _, rest = status_line.decode("latin-1").partition(" ")
+        if not version.startswith("HTTP/") or not rest[:3].isdigit():
+            raise ValueError(f"Malformed status line {status_line!r}")
+        status = int(rest[:3])
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n"):
+                break
+            if not line:
+                raise EOFError("Connection closed in the response headers")
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip().lower()
+
+        connection = headers.get("connection", "")
+        keep_alive = connection == "keep-alive" if version == "HTTP/1.0" else connection != "close"
+        if method == "HEAD" or status in (204, 304) or 100 <= status < 200:
+            return status, keep_alive
+        if "chunked" in headers.get("transfer-encoding", ""):
+            drained = 0
+            while True:
+                size = int((await reader.readline()).split(b";")[0].strip() or b"0", 16)
+                drained += size
+                if drained > MAX_DRAINED_BODY:
+                    return status, False
+                if size == 0:
+                    # Trailers, up to the empty line
+                    while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                        pass
+                    return status, keep_alive
+                await reader.readexactly(size + 2)
+        if "content-length" in headers:
+            length = int(headers["content-length"])
+            if length > MAX_DRAINED_BODY:
+                return status, False
+            await reader.readexactly(length)
+            return status, keep_alive
+        # The body ends when the server closes the connection
+        return status, False
+
+
+class LinkHealthChecker:
+    """
+    Check the target URLs of the active links in batches, most clicked first.
+
+    Each batch runs in its own event loop (see `run_once`). A thread runs a batch every
+    `interval` seconds, and whenever one is asked for with `request_run`, so that on-demand
+    checks do not hold the caller for the duration of a batch.
+
+    Args:
+        session_factory (callable): The session factory used to read and record the links.
+        interval (float): The time in seconds between two batches of the background thread, 0
+            to only run the batches asked for with `request_run`.
+        batch_size (int): The maximum number of links checked per batch.
+        recheck_after (float): The time in seconds after which a checked link is due again.
+        **client_options: The options of `LinkClient` (concurrency, per_host_delay, ...).
+
+    Attributes:
+        last_report (dict, optional): The report of the last completed batch, see `run_once`.
+        last_error (str, optional): Why the last batch of the thread failed, None if it succeeded.
+        running (bool): Whether the thread is checking a batch.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[..., Session],
+        interval: float,
+        batch_size: int = 500,
+        recheck_after: float = 86400.0,
+        **client_options,
+    ):
+        self.session_factory = session_factory
+        self.interval = interval
+        self.batch_size = batch_size
+        self.recheck_after = recheck_after
+        self.client_options = client_options
+        self.last_report: Optional[dict] = None
+        self.last_error: Optional[str] = None
+        self.running = False
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="link-health-checker", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            thread.join()
+        self._wake.clear()
+
+    def request_run(self):
+        """
+        Ask the checker thread to check a batch of due links now, starting it if needed.
+
+        A request made while a batch is being checked runs another batch once it is done.
+        """
+        self._wake.set()
+        self.start()
+
+    def run_once(self) -> dict:
+        """
+        Check one batch of due links now and record the results.
+
+        Returns:
+            dict: The number of links checked and failed, the connections opened, the requests
+                sent and the duration of the batch.
+        """
+        self.last_report = asyncio.run(self.check_batch())
+        return self.last_report
+
+    async def check_batch(self) -> dict:
+        """
+        Check one batch of due links in the running event loop and record the results.
+
+        Returns:
+            dict: See `run_once`.
+        """
+        start = time.monotonic()
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        db = self.session_factory()
+        try:
+            links = crud.get_links_due_for_check(db, now - timedelta(seconds=self.recheck_after), self.batch_size)
+            # Links sharing a target are checked once; the checks start in order of clicks
+            urls = list(dict.fromkeys(link.target_url for link in links))
+            async with LinkClient(**self.client_options) as client:
+                results = dict(zip(urls, await asyncio.gather(*(client.check(url) for url in urls))))
+            statuses = {link.key: results[link.target_url].status for link in links}
+            failed = [link.key for link in links if results[link.target_url].failed]
+            crud.record_link_checks(db, statuses, failed, now)
+        finally:
+            db.close()
+        return {
+            "checked": len(links),
+            "failed": len(failed),
+            "connections_opened": client.connections_opened,
+            "requests": client.requests,
+            "seconds": time.monotonic() - start,
+        }
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval if self.interval > 0 else None)
+            if self._stop.is_set():
+                return
+            self._wake.clear()
+            self.running = True
+            try:
+                self.run_once()
+                self.last_error = None
+            except Exception as error:
+                self.last_error = str(error)
+                logger.exception("Link health check failed")
+            finally:
+                self.running = False
@@ -3,27 +3,167 @@ This module defines the main FastAPI application for the URL shortener service.
 
 It includes endpoint definitions for:
 - A root welcome message
-- URL creation with validation and storage
+- URL creation with validation and storage, with an optional custom alias
+- Alias availability checks with suggestions
 """
 
-import uvicorn
-import validators
 import secrets
+from concurrent.futures import TimeoutError
+from functools import lru_cache
+from typing import Optional
 
-from fastapi import Depends, FastAPI, HTTPException, Request
-from fastapi.responses import RedirectResponse
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request
+from fastapi.responses import PlainTextResponse, RedirectResponse
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from starlette.datastructures import URL
 
-from . import crud, models, schemas
-from .database import SessionLocal, engine
-from .keygen import create_random_key
+from . import crud, models, ratelimit, schemas
+from .aliases import alias_index, is_valid_alias
+from .backup import BackupScheduler, sqlite_path
+from .database import SessionLocal, init_db, shard_engines
+from .group_commit import GroupCommitWriter
+from .healthcheck import LinkHealthChecker
+from .profiling import SamplingProfiler, SlowRequestMiddleware, install_sql_capture
+from .serializers import FastJSONResponse, URLInfoSerializer
 from .config import get_settings
 
 app = FastAPI()
 
-# Create all tables defined in the models
-models.Base.metadata.create_all(bind=engine)
+# The number of random keys tried before giving up on creating a URL
+RANDOM_KEY_ATTEMPTS = 3
+
+settings = get_settings()
+if settings.rate_limit_enabled:
+    app.add_middleware(
+        ratelimit.RateLimitMiddleware,
+        limits={
+            ratelimit.CREATE: (settings.rate_limit_create_rate, settings.rate_limit_create_burst),
+            ratelimit.ADMIN: (settings.rate_limit_admin_rate, settings.rate_limit_admin_burst),
+            ratelimit.REDIRECT: (settings.rate_limit_redirect_rate, settings.rate_limit_redirect_burst),
+        },
+        api_keys=ratelimit.parse_api_keys(settings.rate_limit_api_keys),
+    )
+
+if settings.slow_request_threshold_ms > 0:
+    for shard_engine in shard_engines.values():
+        install_sql_capture(shard_engine)
+    app.add_middleware(SlowRequestMiddleware, threshold=settings.slow_request_threshold_ms / 1000)
+
+# On-demand profiler of the running process, driven by the admin endpoints
+profiler = SamplingProfiler()
+
+# Concurrent URL creations share their commits when group commit is enabled
+group_commit_writer = (
+    GroupCommitWriter(
+        SessionLocal,
+        max_delay=settings.group_commit_max_delay_ms / 1000,
+        max_batch=settings.group_commit_max_batch,
+    )
+    if settings.group_commit_enabled
+    else None
+)
+
+@app.on_event("startup")
+def migrate_database():
+    """
+    Create the missing tables, columns and indexes before the application serves requests.
+
+    Schema creation used to run at import time; running it as a startup step keeps
+    imports (and therefore test collection and container cold starts) free of database I/O.
+    """
+    init_db()
+
+@app.on_event("startup")
+def load_alias_index():
+    """
+    Load the keys of the `urls` table into the in-memory alias index used for suggestions.
+    """
+    db = SessionLocal()
+    try:
+        alias_index.load(db)
+    finally:
+        db.close()
+
+@lru_cache
+def get_backup_scheduler() -> BackupScheduler:
+    """
+    Build the backup scheduler of all the database shards from the settings.
+
+    Returns:
+        BackupScheduler: The scheduler, started at startup when `backup_interval_seconds` is set.
+
+    Raises:
+        ValueError: If the database is not a SQLite file.
+    """
+    return BackupScheduler(
+        [sqlite_path(shard_engine) for shard_engine in shard_engines.values()],
+        settings.backup_interval_seconds,
+        directory=settings.backup_dir,
+        retention=settings.backup_retention,
+        compress=settings.backup_compress,
+        pages=settings.backup_step_pages,
+        pause=settings.backup_step_pause_ms / 1000,
+    )
+
+@app.on_event("startup")
+def start_backup_scheduler():
+    """
+    Start taking scheduled snapshots of the database when `backup_interval_seconds` is set.
+    """
+    if settings.backup_interval_seconds > 0:
+        get_backup_scheduler().start()
+
+@app.on_event("shutdown")
+def stop_backup_scheduler():
+    """
+    Stop the scheduled snapshots, and the snapshots asked for through `/admin/backup`.
+    """
+    if settings.backup_interval_seconds > 0 or get_backup_scheduler.cache_info().currsize:
+        get_backup_scheduler().stop()
+
+@lru_cache
+def get_link_checker() -> LinkHealthChecker:
+    """
+    Build the link-health checker from the settings.
+
+    Returns:
+        LinkHealthChecker: The checker, started at startup when `link_check_interval_seconds` is set.
+    """
+    return LinkHealthChecker(
+        SessionLocal,
+        settings.link_check_interval_seconds,
+        batch_size=settings.link_check_batch_size,
+        recheck_after=settings.link_check_recheck_hours * 3600,
+        concurrency=settings.link_check_concurrency,
+        per_host_concurrency=settings.link_check_per_host_concurrency,
+        per_host_delay=settings.link_check_per_host_delay_ms / 1000,
+        timeout=settings.link_check_timeout_seconds,
+        allow_private=settings.link_check_allow_private_targets,
+    )
+
+@app.on_event("startup")
+def start_link_checker():
+    """
+    Start checking the target URLs in the background when `link_check_interval_seconds` is set.
+    """
+    if settings.link_check_interval_seconds > 0:
+        get_link_checker().start()
+
+@app.on_event("shutdown")
+def stop_link_checker():
+    """
+    Stop the background link-health checks, and the checks asked for through `/admin/links/check`.
+    """
+    if settings.link_check_interval_seconds > 0 or get_link_checker.cache_info().currsize:
+        get_link_checker().stop()
+
+@app.on_event("shutdown")
+def stop_group_commit_writer():
+    """
+    Commit the URL creations still queued and stop the group commit writer thread.
+    """
+    if group_commit_writer is not None:
+        group_commit_writer.stop()
 
 def get_db():
     """
@@ -45,34 +185,53 @@ def get_db():
     finally:
         db.close()
 
-def get_admin_info(db_url: models.URL) -> schemas.URLInfo:
+def require_admin(x_admin_key: str = Header(None)):
+    """
+    Dependency function restricting an endpoint to operators holding the admin API key.
+
+    The service-wide admin endpoints are disabled while no `admin_api_key` is configured.
+
+    Args:
+        x_admin_key (str): The value of the `X-Admin-Key` request header.
+
+    Raises:
+        HTTPException: A 403 Forbidden error if the key is missing, wrong or not configured.
+    """
+    admin_api_key = settings.admin_api_key
+    if not admin_api_key or not x_admin_key or not secrets.compare_digest(x_admin_key, admin_api_key):
+        raise HTTPException(status_code=403, detail="A valid admin key is required")
+
+@lru_cache
+def get_url_info_serializer() -> URLInfoSerializer:
+    """
+    Build the serializer of URL entries once, from the base URL and the admin endpoint path.
+
+    Returns:
+        URLInfoSerializer: The serializer producing the fields of `schemas.URLInfo`.
+    """
+    placeholder = "SECRET"
+    admin_endpoint = app.url_path_for("administration info", secret_key=placeholder)
+    return URLInfoSerializer(get_settings().base_url, admin_endpoint[:-len(placeholder)])
+
+def get_admin_info(db_url: models.URL) -> dict:
     """
     Generate the administrative URL information for a given URL entry.
 
     This function takes a `models.URL` object, which represents a URL entry in the database,
-    and constructs the administrative URL information by generating the full URL for accessing
-    the URL's short and admin endpoints. It uses the base URL from the settings and the FastAPI
-    application's URL path for the admin endpoint to create these URLs.
+    and maps it to the fields of `schemas.URLInfo`, including the full URLs for accessing
+    the URL's short and admin endpoints. These URLs are built from prefixes computed once
+    from the base URL in the settings and the FastAPI application's admin endpoint path.
 
     Args:
-        db_url (models.URL): An instance of `models.URL` representing the URL entry in the database.
-            This object must include the `key` and `secret_key` attributes to construct the URLs.
+        db_url (models.URL): An instance of `models.URL` representing the URL entry in the database,
+            or a row with the same columns. It must include the `key` and `secret_key` attributes.
 
     Returns:
-        schemas.URLInfo: An instance of `schemas.URLInfo` with updated fields:
+        dict: The fields of `schemas.URLInfo`, including:
             - `url`: The full URL that redirects to the shortened URL based on the `key`.
             - `admin_url`: The full URL to access the administrative interface for this URL, based on the `secret_key`.
-
-    Raises:
-        Exception: Raises an exception if the URL or admin endpoint cannot be constructed properly.
     """
-    base_url = URL(get_settings().base_url)
-    admin_endpoint = app.url_path_for(
-        "administration info", secret_key=db_url.secret_key
-    )
-    db_url.url = str(base_url.replace(path=db_url.key))
-    db_url.admin_url = str(base_url.replace(path=admin_endpoint))
-    return db_url
+    return get_url_info_serializer().to_dict(db_url)
 
 
 def raise_not_found(request):
@@ -100,6 +259,21 @@ def raise_bad_request(message):
     """
     raise HTTPException(status_code=400, detail=message)
 
+def raise_alias_taken(db: Session, alias: str):
+    """
+    Raise an HTTP 409 Conflict exception for a taken alias, with available suggestions.
+
+    Args:
+        db (Session): The SQLAlchemy database session used to confirm the suggestions.
+        alias (str): The alias that is already taken.
+
+    Raises:
+        HTTPException: An exception with status code 409, the message and the suggestions.
+    """
+    suggestions = alias_index.suggest(alias, lambda candidate: crud.is_key_available(db, candidate))
+    detail = {"message": f"Alias '{alias}' is already taken", "suggestions": suggestions}
+    raise HTTPException(status_code=409, detail=detail)
+
 @app.get("/")
 def read_root():
     """
@@ -111,30 +285,83 @@ def read_root():
     return "Welcome to the URL shortener API :)"
 
 @app.post("/url", response_model=schemas.URLInfo)
-def create_url(url: schemas.URLBase, db: Session = Depends(get_db)):
+def create_url(url: schemas.URLCreate, db: Session = Depends(get_db)):
     """
     Handle POST requests to create a new shortened URL.
 
     Validates the provided URL, generates a unique short key and secret key,
-    and stores the URL along with these keys in the database.
+    and stores the URL along with these keys in the database. When a custom alias
+    is provided, it is used as the short key if it is valid and still available.
 
     Args:
-        url (schemas.URLBase): The URL to be shortened, provided in the request body.
+        url (schemas.URLCreate): The URL to be shortened and an optional alias, provided in the request body.
         db (Session, optional): A SQLAlchemy database session obtained from the `get_db` dependency.
 
     Returns:
         schemas.URLInfo: The details of the created URL including its short and admin URLs.
 
     Raises:
-        HTTPException: If the provided URL is not valid.
+        HTTPException: If the provided URL or alias is not valid (400), if the alias is taken (409),
+            or if the group-commit writer did not take the new entry in time (503).
     """
+    # validators compiles a large regular expression on import, so it is loaded on first use
+    import validators
+
     if not validators.url(url.target_url):
 
         raise_bad_request(message="Your provided URL is not valid")
 
-    db_url = crud.create_db_url(db=db, url=url)
+    if url.custom_key is not None:
+        if not is_valid_alias(url.custom_key):
+            raise_bad_request(message="Your provided alias is not valid")
+        if not crud.is_key_available(db, url.custom_key):
+            raise_alias_taken(db, url.custom_key)
+
+    for attempt in range(RANDOM_KEY_ATTEMPTS):
+        try:
+            if group_commit_writer is not None:
+                db_url = group_commit_writer.create(crud.build_db_url(url, key=url.custom_key))
+            else:
+                db_url = crud.create_db_url(db=db, url=url, key=url.custom_key)
+            break
+        except TimeoutError:
+            # The entry was withdrawn from the writer queue, nothing was inserted
+            raise HTTPException(status_code=503, detail="The service is busy, please try again")
+        except IntegrityError:
+            db.rollback()
+            if url.custom_key is not None and not crud.is_key_available(db, url.custom_key):
+                # Another request reserved the same alias between the check and the insert
+                raise_alias_taken(db, url.custom_key)
+            # A random key (or the random secret key of an alias) collided with an existing
+            # one: try again with new random keys
+            if attempt == RANDOM_KEY_ATTEMPTS - 1:
+                raise
+    alias_index.add(db_url.key)
+
+    return FastJSONResponse(get_admin_info(db_url))
+
+@app.get("/alias/{alias}", response_model=schemas.AliasAvailability)
+def check_alias(alias: str, db: Session = Depends(get_db)):
+    """
+    Check whether a custom alias is available, suggesting variants when it is taken.
+
+    Args:
+        alias (str): The alias to check.
+        db (Session, optional): A SQLAlchemy database session obtained from the `get_db` dependency.
+
+    Returns:
+        schemas.AliasAvailability: The availability of the alias and, if taken, available variants.
+
+    Raises:
+        HTTPException: If the alias is not valid, raises a 400 Bad Request error.
+    """
+    if not is_valid_alias(alias):
+        raise_bad_request(message="Your provided alias is not valid")
 
-    return get_admin_info(db_url)
+    if crud.is_key_available(db, alias):
+        return schemas.AliasAvailability(alias=alias, available=True)
+    suggestions = alias_index.suggest(alias, lambda candidate: crud.is_key_available(db, candidate))
+    return schemas.AliasAvailability(alias=alias, available=False, suggestions=suggestions)
 
 @app.get("/{url_key}")
 def forward_to_target_url(url_key: str, request: Request, db: Session = Depends(get_db)):
@@ -151,13 +378,254 @@ def forward_to_target_url(url_key: str, request: Request, db: Session = Depends(
 
     Raises:
         HTTPException: If the key is not found or inactive, raises a 404 Not Found error.
+            If the target is dead and the `dead_link_policy` is "skip", raises a 410 Gone error.
     """
-    if db_url := crud.get_db_url_by_key(db=db, url_key=url_key):
-        crud.update_db_clicks(db=db, db_url=db_url)
-        return RedirectResponse(db_url.target_url)
+    if redirect := crud.get_redirect_by_key(db=db, url_key=url_key):
+        dead = (redirect.check_failures or 0) >= settings.dead_link_failures
+        if dead and settings.dead_link_policy == "skip":
+            raise HTTPException(status_code=410, detail=f"The target of '{request.url}' no longer answers")
+        crud.increment_db_clicks_by_key(db=db, url_key=url_key)
+        response = RedirectResponse(redirect.target_url)
+        if dead:
+            response.headers["X-Link-Health"] = "dead"
+        return response
     else:
         raise_not_found(request)
 
+@app.get("/admin/stats", dependencies=[Depends(require_admin)])
+def get_stats():
+    """
+    Report the internal counters of the service.
+
+    Only available to operators sending the admin API key in the `X-Admin-Key` header.
+
+    Returns:
+        dict: The counters of the coalesced redirect lookups (`calls` run, `coalesced` and `in_flight`)
+            and, when group commit is enabled, the batch sizes it achieved.
+    """
+    stats = {"key_lookups": crud.key_lookups.stats()}
+    if group_commit_writer is not None:
+        stats["group_commit"] = group_commit_writer.stats()
+    return stats
+
+@app.get("/admin/urls", dependencies=[Depends(require_admin)], response_model=schemas.URLPage)
+def list_urls(
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    active: Optional[bool] = None,
+    min_clicks: Optional[int] = Query(None, ge=0),
+    domain: Optional[str] = Query(None, min_length=1),
+    db: Session = Depends(get_db),
+):
+    """
+    List the shortened URLs, one page at a time.
+
+    Only available to operators sending the admin API key in the `X-Admin-Key` header.
+    Pages are chained with keyset pagination: pass the `next_cursor` of a page as `cursor`
+    to get the next one, until `next_cursor` is null. URLs are listed in creation order, or
+    by target domain with a domain prefix, one shard after the other. With `min_clicks`, a
+    page may hold fewer than `limit` URLs while `next_cursor` is set (see `crud.list_db_urls`).
+
+    Args:
+        cursor (str, optional): The `next_cursor` of the previous page.
+        limit (int): The maximum number of URLs in the page (1 to 1000).
+        active (bool, optional): Only list active or inactive URLs.
+        min_clicks (int, optional): Only list URLs clicked at least this many times.
+        domain (str, optional): Only list URLs whose target domain starts with this prefix, e.g. "docs.".
+        db (Session, optional): A SQLAlchemy database session obtained from the `get_db` dependency.
+
+    Returns:
+        schemas.URLPage: The URLs of the page and the cursor of the next page.
+
+    Raises:
+        HTTPException: A 400 Bad Request error if the cursor is malformed.
+    """
+    try:
+        rows, next_cursor = crud.list_db_urls(
+            db, cursor=cursor, limit=limit, is_active=active, min_clicks=min_clicks, domain=domain
+        )
+    except ValueError as error:
+        raise_bad_request(message=str(error))
+    return FastJSONResponse({"urls": get_url_info_serializer().to_dicts(rows), "next_cursor": next_cursor})
+
+@app.post("/admin/profiler/start", dependencies=[Depends(require_admin)])
+def start_profiler(seconds: float = 30.0, interval_ms: float = 5.0):
+    """
+    Start the sampling profiler for a number of seconds.
+
+    Only available to operators sending the admin API key in the `X-Admin-Key` header.
+
+    Args:
+        seconds (float): The duration after which sampling stops automatically (at most 600).
+        interval_ms (float): The time in milliseconds between two samples (at least 1).
+
+    Returns:
+        dict: A message confirming the profiler was started.
+
+    Raises:
+        HTTPException: A 400 Bad Request error for invalid parameters, or a 409 Conflict error
+            if the profiler is already running.
+    """
+    if not 0 < seconds <= 600 or interval_ms < 1:
+        raise_bad_request(message="seconds must be in (0, 600] and interval_ms at least 1")
+    try:
+        profiler.start(duration=seconds, interval=interval_ms / 1000)
+    except RuntimeError as error:
+        raise HTTPException(status_code=409, detail=str(error))
+    return {"detail": f"Profiling for {seconds:g} seconds every {interval_ms:g} ms"}
+
+@app.post("/admin/profiler/stop", dependencies=[Depends(require_admin)], response_class=PlainTextResponse)
+def stop_profiler():
+    """
+    Stop the sampling profiler if it is running and return the stacks of its last run.
+
+    Only available to operators sending the admin API key in the `X-Admin-Key` header.
+
+    Returns:
+        str: The collapsed stacks (`frame;frame;frame count` lines), ready for flamegraph tools.
+    """
+    return profiler.stop()
+
+@app.post("/admin/backup", dependencies=[Depends(require_admin)], status_code=202)
+def create_backup():
+    """
+    Ask for a snapshot of every database shard now, taken by the backup scheduler thread.
+
+    Only available to operators sending the admin API key in the `X-Admin-Key` header. The
+    snapshots are taken in the background, while the service keeps running; their reports
+    are returned by `GET /admin/backup`.
+
+    Returns:
+        dict: Whether snapshots were already being taken.
+
+    Raises:
+        HTTPException: A 400 Bad Request error if the database is not a SQLite file.
+    """
+    try:
+        scheduler = get_backup_scheduler()
+    except ValueError as error:
+        raise_bad_request(message=str(error))
+    running = scheduler.running
+    scheduler.request_run()
+    return {"accepted": True, "running": running}
+
+@app.get("/admin/backup", dependencies=[Depends(require_admin)])
+def get_backup_status():
+    """
+    Report the last snapshots taken by the backup scheduler.
+
+    Only available to operators sending the admin API key in the `X-Admin-Key` header.
+
+    Returns:
+        dict: Whether snapshots are being taken, the report of each last snapshot (throughput,
+            steps, restarts, longest read lock) and the error of the last run, if it failed.
+
+    Raises:
+        HTTPException: A 400 Bad Request error if the database is not a SQLite file.
+    """
+    try:
+        scheduler = get_backup_scheduler()
+    except ValueError as error:
+        raise_bad_request(message=str(error))
+    return {
+        "running": scheduler.running,
+        "backups": [report.as_dict() for report in scheduler.last_reports],
+        "error": scheduler.last_error,
+    }
+
+@app.post("/admin/bulk/deactivate", dependencies=[Depends(require_admin)])
+def bulk_deactivate(body: schemas.BulkDeactivate, db: Session = Depends(get_db)):
+    """
+    Deactivate many URLs at once, given their secret keys or their target domain.
+
+    Only available to operators sending the admin API key in the `X-Admin-Key` header.
+    The URLs are deactivated with set-based statements in a single transaction.
+
+    Args:
+        body (schemas.BulkDeactivate): Either the secret keys of the URLs or their target domain.
+        db (Session, optional): A SQLAlchemy database session obtained from the `get_db` dependency.
+
+    Returns:
+        dict: The number of URLs deactivated, the outcome for each secret key ("deactivated",
+            "already_inactive" or "not_found"), and for a domain, whether more of its URLs remain
+            active (`more`): at most `schemas.MAX_BULK_ITEMS` are deactivated per request.
+
+    Raises:
+        HTTPException: A 400 Bad Request error unless exactly one of `secret_keys` and `domain` is given.
+    """
+    if (body.secret_keys is None) == (body.domain is None):
+        raise_bad_request(message="Provide either secret_keys or domain")
+    more = False
+    if body.secret_keys is not None:
+        outcomes = crud.deactivate_db_urls_by_secret_keys(db, body.secret_keys)
+    else:
+        outcomes, more = crud.deactivate_db_urls_by_domain(
+            db, body.domain, include_subdomains=body.include_subdomains, limit=schemas.MAX_BULK_ITEMS
+        )
+    return FastJSONResponse({
+        "deactivated": sum(outcome == crud.DEACTIVATED for outcome in outcomes.values()),
+        "more": more,
+        "results": [{"secret_key": secret_key, "status": outcome} for secret_key, outcome in outcomes.items()],
+    })
+
+@app.post("/admin/bulk/info", dependencies=[Depends(require_admin)])
+def bulk_info(body: schemas.BulkSecretKeys, db: Session = Depends(get_db)):
+    """
+    Retrieve the information of many URLs at once, given their secret keys.
+
+    Only available to operators sending the admin API key in the `X-Admin-Key` header.
+    Unlike `GET /admin/{secret_key}`, deactivated URLs are reported as well.
+
+    Args:
+        body (schemas.BulkSecretKeys): The secret keys of the URLs.
+        db (Session, optional): A SQLAlchemy database session obtained from the `get_db` dependency.
+
+    Returns:
+        dict: One result per distinct secret key, in the order given, with a "found" status and
+            the URL information, or a "not_found" status.
+    """
+    found = crud.get_db_urls_by_secret_keys(db, body.secret_keys)
+    serializer = get_url_info_serializer()
+    results = []
+    for secret_key in dict.fromkeys(body.secret_keys):
+        row = found.get(secret_key)
+        if row is None:
+            results.append({"secret_key": secret_key, "status": crud.NOT_FOUND})
+        else:
+            results.append({"secret_key": secret_key, "status": "found", "info": serializer.to_dict(row)})
+    return FastJSONResponse({"results": results})
+
+@app.post("/admin/links/check", dependencies=[Depends(require_admin)], status_code=202)
+def check_links():
+    """
+    Ask for a batch of due target URLs to be checked now, most clicked first.
+
+    Only available to operators sending the admin API key in the `X-Admin-Key` header. The
+    batch is checked by the checker thread, as its per-host delays and timeouts can take
+    minutes; its report is returned by `GET /admin/links/check`.
+
+    Returns:
+        dict: Whether a batch was already being checked.
+    """
+    checker = get_link_checker()
+    running = checker.running
+    checker.request_run()
+    return {"accepted": True, "running": running}
+
+@app.get("/admin/links/check", dependencies=[Depends(require_admin)])
+def get_link_check_status():
+    """
+    Report the last batch of link-health checks.
+
+    Only available to operators sending the admin API key in the `X-Admin-Key` header.
+
+    Returns:
+        dict: Whether a batch is being checked, the report of the last batch (links checked
+            and failed, connections and requests used) and the error of the last batch, if it failed.
+    """
+    checker = get_link_checker()
+    return {"running": checker.running, "last_report": checker.last_report, "error": checker.last_error}
+
 @app.get("/admin/{secret_key}", name="administration info", response_model=schemas.URLInfo)
 def get_url_info(secret_key: str, request: Request, db: Session = Depends(get_db)):
     """
@@ -179,7 +647,7 @@ def get_url_info(secret_key: str, request: Request, db: Session = Depends(get_db
                        raises a 404 Not Found error with a message indicating the URL does not exist.
     """
     if db_url := crud.get_db_url_by_secret_key(db, secret_key=secret_key):
-        return get_admin_info(db_url)
+        return FastJSONResponse(get_admin_info(db_url))
     else:
         raise_not_found(request)
 
@@ -211,4 +679,6 @@ def delete_url(secret_key: str, request: Request, db: Session = Depends(get_db))
 
 
 if __name__ == "__main__":
+    import uvicorn
+
     uvicorn.run(app, host="127.0.0.1", port=5000, log_level="info")
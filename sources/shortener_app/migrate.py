@@ -0,0 +1,21 @@
+"""
+This module migrates the database schema without starting the application.
+
+It is a separate module so that `shortener_app.database` is imported under its own name:
+run as `python -m shortener_app.database`, the module would define a second `Base`, on
+which the models are not registered. Run with:
+    python -m shortener_app.migrate
+"""
+
+from .database import init_db
+
+
+def main():
+    """
+    Create the missing tables, columns and indexes of every database shard.
+    """
+    init_db()
+
+
+if __name__ == "__main__":
+    main()
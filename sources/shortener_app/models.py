@@ -1,15 +1,90 @@
 # shortener_app/models.py
 
-from sqlalchemy import Boolean, Column, Integer, String
+from typing import Optional
+from urllib.parse import urlsplit
+
+from sqlalchemy import Boolean, Column, DateTime, Index, Integer, String, bindparam, select
 
 from .database import Base
 
+def target_domain_of(target_url: str) -> Optional[str]:
+    """
+    Extract the lowercase host name of a target URL, used to filter URL entries by domain.
+
+    Parameters:
+    target_url (str): The target URL.
+
+    Returns:
+    str: The host name without port or credentials, or None if the URL has none.
+    """
+    try:
+        return urlsplit(target_url).hostname
+    except ValueError:
+        return None
+
+def _default_target_domain(context) -> Optional[str]:
+    return target_domain_of(context.get_current_parameters()["target_url"] or "")
+
 class URL(Base):
     __tablename__ = "urls"
 
     id = Column(Integer, primary_key=True)
     key = Column(String, unique=True, index=True)
+    # Unique within a shard only: see crud.assign_unique_secret_keys for the other shards
     secret_key = Column(String, unique=True, index=True)
     target_url = Column(String, index=True)
     is_active = Column(Boolean, default=True)
-    clicks = Column(Integer, default=0)
\ No newline at end of file
+    clicks = Column(Integer, default=0)
+    # Derived from target_url when the entry is inserted, see target_domain_of
+    target_domain = Column(String, default=_default_target_domain)
+    # Maintained by the link-health checker, see healthcheck.py: the HTTP status of the last
+    # check (0 when the target did not answer), its time (UTC), and the consecutive failures
+    last_status = Column(Integer)
+    last_checked_at = Column(DateTime)
+    check_failures = Column(Integer, default=0, server_default="0")
+
+    __table_args__ = (
+        # Keyset pagination of the admin listing: each filter is an index range scan in the
+        # order of the pages, id or (target_domain, id) with a domain prefix
+        Index("ix_urls_is_active_id", "is_active", "id"),
+        Index("ix_urls_target_domain_id", "target_domain", "id"),
+        Index("ix_urls_is_active_target_domain_id", "is_active", "target_domain", "id"),
+        # The link-health checker visits the active entries by decreasing clicks
+        Index("ix_urls_is_active_clicks", "is_active", "clicks"),
+    )
+
+def backfill_target_domains(bind, batch_size: int = 10000) -> int:
+    """
+    Fill in the target domain of the URL entries created before the column existed.
+
+    Each batch is committed in its own transaction, so writers wait for one batch at most
+    instead of the whole backfill. An interrupted backfill resumes from the entries still
+    without a domain.
+
+    Parameters:
+    bind (Engine): The engine of the database to migrate.
+    batch_size (int): The number of entries updated per transaction.
+
+    Returns:
+    int: The number of entries updated.
+    """
+    table = URL.__table__
+    updated = 0
+    last_id = 0
+    while True:
+        with bind.begin() as connection:
+            rows = connection.execute(
+                select(table.c.id, table.c.target_url)
+                .where(table.c.target_domain.is_(None), table.c.id > last_id)
+                .order_by(table.c.id)
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                return updated
+            last_id = rows[-1].id
+            # Entries without a host get an empty domain so they are not scanned again
+            connection.execute(
+                table.update().where(table.c.id == bindparam("row_id")),
+                [{"row_id": row.id, "target_domain": target_domain_of(row.target_url or "") or ""} for row in rows],
+            )
+        updated += len(rows)
@@ -0,0 +1,202 @@
+"""
+This module provides production profiling tools for the URL shortener application.
+
+- `SamplingProfiler` periodically samples the stacks of all threads of the process and
+  aggregates them as "collapsed stacks" (one `frame;frame;frame count` line per stack), the
+  input format of flamegraph.pl, speedscope and similar tools. Its overhead is a stack walk
+  every sampling interval, independent of the request rate.
+- `SlowRequestMiddleware` times each request and logs the ones slower than a threshold, with
+  the SQL statements they ran and their timings, captured through SQLAlchemy engine events
+  installed by `install_sql_capture`.
+"""
+
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# The SQL statements run by the current request, as (statement, seconds) tuples,
+# or None outside of a request being timed
+_captured_statements: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar(
+    "captured_statements", default=None
+)
+
+
+class SamplingProfiler:
+    """
+    A low-overhead statistical profiler sampling the stacks of every thread.
+
+    Args:
+        interval (float): The time in seconds between two samples.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._stacks: Counter = Counter()
+        self.samples = 0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, duration: Optional[float] = None, interval: Optional[float] = None):
+        """
+        Start sampling, discarding the stacks of the previous run.
+
+        Args:
+            duration (float, optional): Stop automatically after this many seconds.
+            interval (float, optional): Override the time in seconds between two samples.
+
+        Raises:
+            RuntimeError: If the profiler is already running.
+        """
+        with self._lock:
+            if self.running:
+                raise RuntimeError("The profiler is already running")
+            if interval is not None:
+                self.interval = interval
+            self._stacks = Counter()
+            self.samples = 0
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._sample, args=(duration,), name="sampling-profiler", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self) -> str:
+        """
+        Stop sampling if it is running, and return the stacks collected by the last run.
+
+        Returns:
+            str: The collapsed stacks, one `frame;frame;frame count` line per distinct stack.
+        """
+        self._stop.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join()
+        return self.collapsed()
+
+    def collapsed(self) -> str:
+        """
+        Return the stacks collected so far in the collapsed stack format.
+
+        Returns:
+            str: One `frame;frame;frame count` line per distinct stack, most frequent first.
+        """
+        with self._lock:
+            stacks = self._stacks.most_common()
+        return "".join(f"{';'.join(stack)} {count}\n" for stack, count in stacks)
+
+    def _sample(self, duration: Optional[float]):
+        own_id = threading.get_ident()
+        deadline = None if duration is None else time.monotonic() + duration
+        labels = {}
+        while not self._stop.wait(self.interval):
+            sampled = []
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    label = labels.get(code)
+                    if label is None:
+                        label = labels[code] = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+                    stack.append(label)
+                    frame = frame.f_back
+                stack.reverse()
+                sampled.append(tuple(stack))
+            with self._lock:
+                self._stacks.update(sampled)
+                self.samples += 1
+            if deadline is not None and time.monotonic() >= deadline:
+                break
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _captured_statements.get() is not None:
+        conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    statements = _captured_statements.get()
+    if statements is not None:
+        start_times = conn.info.get("query_start_time")
+        if start_times:
+            statements.append((statement, time.perf_counter() - start_times.pop()))
+
+
+def install_sql_capture(engine: Engine):
+    """
+    Record the SQL statements run on an engine, with their timings, while a request is timed.
+
+    Outside of a request timed by `SlowRequestMiddleware`, the listeners only do a context
+    variable lookup.
+
+    Args:
+        engine (Engine): The engine to instrument.
+    """
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class SlowRequestMiddleware:
+    """
+    ASGI middleware logging the requests slower than a threshold, with their SQL statements.
+
+    Args:
+        app: The ASGI application to wrap.
+        threshold (float): The duration in seconds above which a request is logged.
+    """
+
+    def __init__(self, app, threshold: float):
+        self.app = app
+        self.threshold = threshold
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = None
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        statements: List[Tuple[str, float]] = []
+        token = _captured_statements.set(statements)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration = time.perf_counter() - start
+            _captured_statements.reset(token)
+            if duration >= self.threshold:
+                sql = "".join(
+                    f"\n  {seconds * 1000:8.2f} ms  {statement}" for statement, seconds in statements
+                )
+                logger.warning(
+                    "Slow request: %s %s -> %s in %.2f ms, %d SQL statements%s",
+                    scope["method"],
+                    scope["path"],
+                    status,
+                    duration * 1000,
+                    len(statements),
+                    sql,
+                )
@@ -0,0 +1,205 @@
+"""
+This module implements per-client rate limiting for the URL shortener application.
+
+Each client (identified by its API key when it sends one of the configured keys, otherwise
+by its IP address) gets a token bucket per route category: URL creation, administration, and
+reads (redirects and alias checks).
+Buckets are kept in a plain dictionary and are dropped once they have been idle long
+enough to be full again, so memory stays proportional to the number of active clients.
+"""
+
+import math
+import time
+from typing import Callable, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from starlette.responses import JSONResponse
+
+CREATE = "create"
+ADMIN = "admin"
+REDIRECT = "redirect"
+
+# Single-segment paths served by the application itself rather than by a short key
+UNLIMITED_PATHS = frozenset({"/docs", "/redoc", "/openapi.json", "/favicon.ico"})
+
+
+class TokenBucketLimiter:
+    """
+    A set of token buckets sharing the same refill rate and capacity.
+
+    Buckets are stored as two-item lists `[tokens, last_refill]` keyed by client id.
+    A bucket that has been idle for longer than `capacity / rate` seconds is full again,
+    so it carries no information and is removed by the periodic sweep.
+
+    Attributes:
+        rate (float): The number of tokens added to a bucket per second.
+        capacity (float): The maximum number of tokens a bucket can hold (the burst size).
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        capacity: float,
+        sweep_interval: float = 60.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if rate <= 0 or capacity < 1:
+            raise ValueError("rate must be positive and capacity at least 1")
+        self.rate = rate
+        self.capacity = capacity
+        self._ttl = capacity / rate
+        self._sweep_interval = sweep_interval
+        self._clock = clock
+        self._buckets: Dict[str, List[float]] = {}
+        self._next_sweep = clock() + sweep_interval
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def acquire(self, client_id: str) -> float:
+        """
+        Try to take one token from the bucket of a client.
+
+        Args:
+            client_id (str): The identifier of the client (API key or IP address).
+
+        Returns:
+            float: 0.0 if the request is allowed, otherwise the number of seconds to
+                wait before a token becomes available.
+        """
+        now = self._clock()
+        if now >= self._next_sweep:
+            self.sweep(now)
+
+        bucket = self._buckets.get(client_id)
+        if bucket is None:
+            self._buckets[client_id] = [self.capacity - 1, now]
+            return 0.0
+
+        tokens = min(self.capacity, bucket[0] + (now - bucket[1]) * self.rate)
+        bucket[1] = now
+        if tokens >= 1:
+            bucket[0] = tokens - 1
+            return 0.0
+        bucket[0] = tokens
+        return (1 - tokens) / self.rate
+
+    def sweep(self, now: Optional[float] = None) -> int:
+        """
+        Remove the buckets that have refilled completely.
+
+        Args:
+            now (float, optional): The current clock value. Defaults to the limiter clock.
+
+        Returns:
+            int: The number of buckets removed.
+        """
+        if now is None:
+            now = self._clock()
+        deadline = now - self._ttl
+        stale = [key for key, bucket in self._buckets.items() if bucket[1] <= deadline]
+        for key in stale:
+            del self._buckets[key]
+        self._next_sweep = now + self._sweep_interval
+        return len(stale)
+
+
+def classify_request(method: str, path: str) -> Optional[str]:
+    """
+    Map a request to the rate-limit category it belongs to.
+
+    Alias availability checks are reads, like redirects, and share their bucket; the
+    documentation pages and the favicon are not limited.
+
+    Args:
+        method (str): The HTTP method of the request.
+        path (str): The path of the request.
+
+    Returns:
+        str: One of `CREATE`, `ADMIN` or `REDIRECT`, or None when the request is not limited.
+    """
+    if path == "/url":
+        return CREATE if method == "POST" else None
+    if path.startswith("/alias/"):
+        return REDIRECT if method == "GET" else None
+    if path.startswith("/admin/"):
+        return ADMIN
+    if path in UNLIMITED_PATHS:
+        return None
+    if method == "GET" and path.count("/") == 1 and len(path) > 1:
+        return REDIRECT
+    return None
+
+
+def parse_api_keys(value: str) -> FrozenSet[str]:
+    """
+    Parse a comma-separated list of API keys, as found in the settings.
+
+    Args:
+        value (str): The keys, separated by commas.
+
+    Returns:
+        frozenset: The non-empty keys.
+    """
+    return frozenset(key.strip() for key in value.split(",") if key.strip())
+
+
+def client_identifier(scope: dict, api_keys: FrozenSet[str] = frozenset()) -> str:
+    """
+    Identify the client of a request by its API key header, falling back to its IP address.
+
+    Only the keys of `api_keys` get their own bucket: any other `X-API-Key` value is
+    ignored, so that a client cannot get a fresh bucket by sending a new header value on
+    each request.
+
+    Args:
+        scope (dict): The ASGI connection scope.
+        api_keys (frozenset): The API keys allowed to be limited separately from their IP address.
+
+    Returns:
+        str: The client identifier used as bucket key.
+    """
+    if api_keys:
+        for name, value in scope.get("headers", ()):
+            if name == b"x-api-key":
+                key = value.decode("latin-1")
+                if key in api_keys:
+                    return "key:" + key
+                break
+    client = scope.get("client")
+    return "ip:" + (client[0] if client else "unknown")
+
+
+class RateLimitMiddleware:
+    """
+    ASGI middleware rejecting requests with `429 Too Many Requests` once a client has
+    exhausted the token bucket of the route category it is calling.
+
+    Args:
+        app: The ASGI application to wrap.
+        limits (dict): A mapping from category to a `(rate, burst)` tuple.
+        api_keys (iterable, optional): The API keys whose clients get their own buckets.
+    """
+
+    def __init__(self, app, limits: Dict[str, Tuple[float, float]], api_keys: Iterable[str] = ()):
+        self.app = app
+        self.api_keys = frozenset(api_keys)
+        self.limiters = {
+            category: TokenBucketLimiter(rate, burst)
+            for category, (rate, burst) in limits.items()
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            category = classify_request(scope["method"], scope["path"])
+            limiter = self.limiters.get(category)
+            if limiter is not None:
+                retry_after = limiter.acquire(client_identifier(scope, self.api_keys))
+                if retry_after:
+                    response = JSONResponse(
+                        {"detail": "Too many requests"},
+                        status_code=429,
+                        headers={"Retry-After": str(math.ceil(retry_after))},
+                    )
+                    await response(scope, receive, send)
+                    return
+        await self.app(scope, receive, send)
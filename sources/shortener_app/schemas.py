@@ -4,7 +4,12 @@ This module defines the Pydantic models for the URL shortener application.
 These models are used for data validation and serialization.
 """
 
-from pydantic import BaseModel
+from typing import List, Optional
+
+from pydantic import BaseModel, conlist, constr
+
+# The maximum number of secret keys accepted by a bulk request
+MAX_BULK_ITEMS = 10000
 
 class URLBase(BaseModel):
     """
@@ -15,6 +20,17 @@ class URLBase(BaseModel):
     """
     target_url: str
 
+class URLCreate(URLBase):
+    """
+    Represents the request body used to create a shortened URL.
+
+    Inherits from URLBase and adds an optional custom alias.
+
+    Attributes:
+        custom_key (str, optional): A custom alias to use instead of a random key.
+    """
+    custom_key: Optional[str] = None
+
 class URL(URLBase):
     """
     Represents the detailed model for a URL including additional information.
@@ -48,3 +64,51 @@ class URLInfo(URL):
     """
     url: str
     admin_url: str
+
+
+class AliasAvailability(BaseModel):
+    """
+    Represents the result of an alias availability check.
+
+    Attributes:
+        alias (str): The requested alias.
+        available (bool): Indicates if the alias can be reserved.
+        suggestions (list): Available variants of the alias when it is taken.
+    """
+    alias: str
+    available: bool
+    suggestions: List[str] = []
+
+class URLPage(BaseModel):
+    """
+    Represents a page of the administrative listing of URLs.
+
+    Attributes:
+        urls (list): The URLs of the page.
+        next_cursor (str, optional): The cursor of the next page, or None on the last page.
+    """
+    urls: List[URLInfo]
+    next_cursor: Optional[str] = None
+
+class BulkSecretKeys(BaseModel):
+    """
+    Represents a bulk request on URLs identified by their secret keys.
+
+    Attributes:
+        secret_keys (list): The secret keys of the URLs, at most `MAX_BULK_ITEMS`.
+    """
+    secret_keys: conlist(str, min_items=1, max_items=MAX_BULK_ITEMS)
+
+class BulkDeactivate(BaseModel):
+    """
+    Represents a bulk deactivation, either of a list of secret keys or of a target domain.
+
+    Attributes:
+        secret_keys (list, optional): The secret keys of the URLs to deactivate, at most `MAX_BULK_ITEMS`.
+        domain (str, optional): Deactivate the URLs pointing to this target domain instead, at
+            most `MAX_BULK_ITEMS` per request. It cannot be empty.
+        include_subdomains (bool): With `domain`, also deactivate the URLs pointing to its subdomains.
+    """
+    secret_keys: Optional[conlist(str, min_items=1, max_items=MAX_BULK_ITEMS)] = None
+    domain: Optional[constr(strip_whitespace=True, min_length=1)] = None
+    include_subdomains: bool = False
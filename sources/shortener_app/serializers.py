@@ -0,0 +1,96 @@
+"""
+This module serializes URL entries to JSON without going through Pydantic.
+
+`schemas.URLInfo` is still the documented response model of the endpoints, but validating
+each ORM object field by field and rebuilding its URLs from the route table on every request
+is wasted work for data that comes straight from our own database. `URLInfoSerializer`
+builds the URL prefixes once and maps rows (ORM instances or column rows) to plain dicts,
+which `FastJSONResponse` encodes with `orjson` (listed in the requirements), or with `json`
+when it is not installed.
+"""
+
+import json
+from typing import Any, Iterable, List
+
+from starlette.datastructures import URL
+from starlette.responses import Response
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+
+def json_dumps(content: Any) -> bytes:
+    """
+    Encode content as compact UTF-8 JSON.
+
+    Args:
+        content (Any): Plain Python data (dicts, lists, strings, numbers, booleans, None).
+
+    Returns:
+        bytes: The JSON document.
+    """
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(Response):
+    """
+    A JSON response encoded with `json_dumps`, for content that is already plain data.
+    """
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return json_dumps(content)
+
+
+class URLInfoSerializer:
+    """
+    Map URL entries to the fields of `schemas.URLInfo`.
+
+    Args:
+        base_url (str): The public base URL of the service; only its scheme and host are used.
+        admin_path_prefix (str): The path of the admin endpoint up to the secret key, e.g. "/admin/".
+    """
+
+    __slots__ = ("url_prefix", "admin_url_prefix")
+
+    def __init__(self, base_url: str, admin_path_prefix: str):
+        origin = str(URL(base_url).replace(path="", query="", fragment=""))
+        self.url_prefix = origin + "/"
+        self.admin_url_prefix = origin + admin_path_prefix
+
+    def to_dict(self, row: Any) -> dict:
+        """
+        Serialize one URL entry.
+
+        Args:
+            row (Any): An object with `key`, `secret_key`, `target_url`, `is_active` and `clicks`
+                attributes, such as a `models.URL` instance or a row of those columns.
+
+        Returns:
+            dict: The fields of `schemas.URLInfo`, in the same order.
+        """
+        return {
+            "target_url": row.target_url,
+            "is_active": row.is_active,
+            "clicks": row.clicks,
+            "url": self.url_prefix + row.key,
+            "admin_url": self.admin_url_prefix + row.secret_key,
+        }
+
+    def to_dicts(self, rows: Iterable[Any]) -> List[dict]:
+        """
+        Serialize many URL entries.
+
+        Args:
+            rows (iterable): The URL entries, see `to_dict`.
+
+        Returns:
+            list: One dict per entry.
+        """
+        to_dict = self.to_dict
+        return [to_dict(row) for row in rows]
@@ -0,0 +1,21 @@
+"""
+This module defines the session class of sharded databases.
+
+It is kept apart from `sharding` so that `sqlalchemy.ext.horizontal_shard` is only imported
+when the database is actually sharded (`shard_count` above 1).
+"""
+
+from sqlalchemy.ext.horizontal_shard import ShardedSession
+
+
+class URLShardedSession(ShardedSession):
+    """
+    A `ShardedSession` that knows the identifiers of its shards, so callers can walk them in order.
+
+    Attributes:
+        shard_ids (list): The identifiers of all shards, in order.
+    """
+
+    def __init__(self, *args, shards=None, **kwargs):
+        super().__init__(*args, shards=shards, **kwargs)
+        self.shard_ids = sorted(shards or (), key=int)
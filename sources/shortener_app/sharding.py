@@ -0,0 +1,296 @@
+"""
+This module spreads the `urls` table over several databases ("shards") by a stable hash of the short key.
+
+Each shard has its own engine, so writes that land on different shards (different SQLite files)
+do not wait on each other's locks. Sessions are SQLAlchemy `ShardedSession` objects whose
+choosers inspect each statement, so the functions in `crud` keep issuing ordinary queries:
+
+- rows are written to the shard of `shard_for_key(row.key, count)`;
+- a query whose WHERE clause and-s a `key` comparison (`==` or `in_`) only touches the shards of
+  those keys; a comparison under an OR or a NOT does not restrict the shards;
+- any other query, including lookups by `secret_key`, runs on every shard and merges the results.
+
+The unique index on `secret_key` only holds within a shard: `crud.assign_unique_secret_keys`
+checks the secret keys of new entries on every shard before they are inserted.
+
+A database can be split into more shards, or shards merged, offline with:
+    python -m shortener_app.sharding --source-count 1 --target-count 4 --target-db-url sqlite:///./new/shortener.db
+"""
+
+import zlib
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.sql import operators
+from sqlalchemy.sql.elements import BinaryExpression, BindParameter, BooleanClauseList, ColumnClause, Grouping
+
+#: The table and columns used to route statements.
+SHARDED_TABLE = "urls"
+SHARD_KEY = "key"
+
+
+def shard_for_key(key: str, count: int) -> str:
+    """
+    Return the identifier of the shard that owns a short key.
+
+    CRC32 is used because it is stable across processes and Python versions, unlike `hash()`.
+
+    Args:
+        key (str): The short key of the URL entry.
+        count (int): The number of shards.
+
+    Returns:
+        str: The shard identifier, from "0" to `count - 1`.
+    """
+    return str(zlib.crc32(key.encode("utf-8")) % count)
+
+
+def shard_urls(db_url: str, count: int) -> List[str]:
+    """
+    Derive the database URL of every shard from the base database URL.
+
+    With one shard the base URL is used unchanged. Otherwise the shard number is appended to the
+    database name, e.g. `sqlite:///./shortener.db` becomes `sqlite:///./shortener-0.db`, ...
+
+    Args:
+        db_url (str): The base database URL.
+        count (int): The number of shards.
+
+    Returns:
+        list: The database URLs, indexed by shard number.
+
+    Raises:
+        ValueError: If `count` is lower than 1 or the URL has no database name to derive from.
+    """
+    if count < 1:
+        raise ValueError("The shard count must be at least 1")
+    if count == 1:
+        return [db_url]
+    url = make_url(db_url)
+    if not url.database or url.database == ":memory:":
+        raise ValueError(f"Cannot derive shard databases from '{db_url}'")
+    stem, dot, extension = url.database.rpartition(".")
+    if not dot or "/" in extension:
+        stem, dot, extension = url.database, "", ""
+    return [
+        str(url.set(database=f"{stem}-{shard}{dot}{extension}"))
+        for shard in range(count)
+    ]
+
+
+def create_shard_engines(db_url: str, count: int) -> Dict[str, Engine]:
+    """
+    Create one engine per shard.
+
+    Args:
+        db_url (str): The base database URL, see `shard_urls`.
+        count (int): The number of shards.
+
+    Returns:
+        dict: A mapping from shard identifier to engine.
+    """
+    return {
+        str(shard): create_engine(url, connect_args={"check_same_thread": False})
+        for shard, url in enumerate(shard_urls(db_url, count))
+    }
+
+
+class ShardRouter:
+    """
+    Choosers used by `ShardedSession` to route rows and statements to shards.
+
+    Attributes:
+        shard_ids (list): The identifiers of all shards, in order.
+    """
+
+    def __init__(self, count: int):
+        self.count = count
+        self.shard_ids = [str(shard) for shard in range(count)]
+
+    def shard_chooser(self, mapper, instance, clause=None):
+        """
+        Choose the shard of an instance being flushed, from its short key.
+        """
+        key = getattr(instance, SHARD_KEY, None)
+        if key is None:
+            return self.shard_ids[0]
+        return shard_for_key(key, self.count)
+
+    def id_chooser(self, query, ident):
+        """
+        Choose the shards to search for a primary key; ids are only unique per shard.
+        """
+        return self.shard_ids
+
+    def execute_chooser(self, orm_context):
+        """
+        Choose the shards a statement runs on, from the short keys in its criteria.
+        """
+        keys = self.criteria_keys(orm_context.statement)
+        if keys is None:
+            return self.shard_ids
+        return sorted({shard_for_key(key, self.count) for key in keys})
+
+    @staticmethod
+    def criteria_keys(statement) -> Optional[List[str]]:
+        """
+        Extract the short keys a statement is restricted to.
+
+        Only the comparisons that are top-level conjuncts of the WHERE clause restrict the
+        rows: a comparison under an OR or a NOT (`key == 'a' OR clicks > 5`), or inside a
+        subquery, does not, so it is ignored and the statement runs on every shard.
+
+        Returns:
+            list: The keys compared with `==` or `in_` against `urls.key` in a top-level
+                conjunct, or None when the statement is not restricted to specific keys.
+        """
+        keys = None
+        for element in _conjuncts(getattr(statement, "whereclause", None)):
+            if not isinstance(element, BinaryExpression):
+                continue
+            column, value = element.left, element.right
+            if not (
+                isinstance(column, ColumnClause)
+                and column.name == SHARD_KEY
+                and column.table is not None
+                and column.table.name == SHARDED_TABLE
+                and isinstance(value, BindParameter)
+            ):
+                continue
+            if element.operator is operators.eq:
+                found = [value.effective_value]
+            elif element.operator is operators.in_op:
+                found = list(value.effective_value)
+            else:
+                continue
+            # Every row matches each conjunct, so the union of their keys is a superset of its key
+            keys = found if keys is None else keys + found
+        return keys
+
+
+def _conjuncts(clause) -> Iterable:
+    """
+    Yield the terms and-ed together at the top level of a WHERE clause.
+    """
+    if clause is None:
+        return
+    if isinstance(clause, Grouping):
+        yield from _conjuncts(clause.element)
+    elif isinstance(clause, BooleanClauseList) and clause.operator is operators.and_:
+        for term in clause.clauses:
+            yield from _conjuncts(term)
+    else:
+        yield clause
+
+
+def session_shard_ids(db) -> List[Optional[str]]:
+    """
+    Return the shards of a session, in order, or `[None]` for a session on a single database.
+    """
+    return getattr(db, "shard_ids", None) or [None]
+
+
+def create_sharded_sessionmaker(shard_engines: Dict[str, Engine]) -> sessionmaker:
+    """
+    Create a session factory spreading the ORM models over the given shard engines.
+
+    Args:
+        shard_engines (dict): A mapping from shard identifier ("0", "1", ...) to engine.
+
+    Returns:
+        sessionmaker: A factory of `sharded_session.URLShardedSession` objects.
+    """
+    from .sharded_session import URLShardedSession
+
+    router = ShardRouter(len(shard_engines))
+    return sessionmaker(
+        class_=URLShardedSession,
+        autocommit=False,
+        autoflush=False,
+        shards=shard_engines,
+        shard_chooser=router.shard_chooser,
+        id_chooser=router.id_chooser,
+        execute_chooser=router.execute_chooser,
+    )
+
+
+def rebalance(
+    source_engines: Iterable[Engine], target_engines: Dict[str, Engine], batch_size: int = 1000
+) -> Dict[str, int]:
+    """
+    Copy every row of the sharded table from one shard layout to another.
+
+    This is an offline operation: the application must not write to the source shards while
+    it runs. Rows are re-routed by their short key and keep all their columns except the
+    primary key, which is reassigned by the target shard since ids are only unique per shard.
+
+    Args:
+        source_engines (iterable): The engines of the current shards.
+        target_engines (dict): A mapping from shard identifier to engine for the new layout.
+            These databases must not be the source databases.
+        batch_size (int): The number of rows read and inserted at a time.
+
+    Returns:
+        dict: The number of rows written to each target shard.
+    """
+    from .database import Base, init_db
+
+    for engine in target_engines.values():
+        init_db(bind=engine)
+
+    table = Base.metadata.tables[SHARDED_TABLE]
+    columns = [column for column in table.columns if not column.primary_key]
+    count = len(target_engines)
+    written = {shard: 0 for shard in target_engines}
+
+    for source in source_engines:
+        with source.connect() as reader:
+            result = reader.execution_options(stream_results=True).execute(
+                select(*columns).order_by(table.c.id)
+            )
+            for rows in result.partitions(batch_size):
+                batches: Dict[str, list] = {}
+                for row in rows:
+                    shard = shard_for_key(row[SHARD_KEY], count)
+                    batches.setdefault(shard, []).append(dict(row._mapping))
+                for shard, batch in batches.items():
+                    with target_engines[shard].begin() as writer:
+                        writer.execute(insert(table), batch)
+                    written[shard] += len(batch)
+    return written
+
+
+def main(argv=None):
+    """
+    Command line entry point of the offline rebalancing tool.
+    """
+    import argparse
+
+    from .config import get_settings
+
+    parser = argparse.ArgumentParser(description="Rebalance or split the URL shards offline.")
+    parser.add_argument("--db-url", default=get_settings().db_url, help="base URL of the current shards")
+    parser.add_argument("--source-count", type=int, required=True, help="current number of shards")
+    parser.add_argument("--target-db-url", required=True, help="base URL of the new shards")
+    parser.add_argument("--target-count", type=int, required=True, help="new number of shards")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args(argv)
+
+    source_urls = shard_urls(args.db_url, args.source_count)
+    target_urls = shard_urls(args.target_db_url, args.target_count)
+    if set(source_urls) & set(target_urls):
+        parser.error("the target shards must be different databases from the source shards")
+
+    written = rebalance(
+        [create_engine(url) for url in source_urls],
+        create_shard_engines(args.target_db_url, args.target_count),
+        batch_size=args.batch_size,
+    )
+    for shard, rows in written.items():
+        print(f"shard {shard}: {rows} rows -> {target_urls[int(shard)]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+This module implements request coalescing ("single flight") for concurrent lookups.
+
+When several threads ask for the same key at the same time, only the first one (the leader)
+runs the lookup; the others wait for it and share its result or its exception. Nothing is
+cached: once the leader is done, the next lookup of the key runs a new query.
+"""
+
+import threading
+from typing import Any, Callable, Dict, Hashable, Iterable
+
+
+class _Call:
+    """
+    The state of a lookup in flight, shared between the leader and the waiting threads.
+    """
+
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    A group of lookups coalesced by key.
+
+    Results are handed to threads that did not run the lookup, so they must not be bound
+    to the leader's resources (for instance, return column values rather than ORM instances
+    attached to the leader's session).
+
+    Attributes:
+        calls (int): The number of lookups actually run.
+        coalesced (int): The number of lookups that shared the result of a lookup in flight.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    def do(self, key: Hashable, function: Callable[[], Any]) -> Any:
+        """
+        Run `function`, unless a lookup of the same key is in flight, in which case wait for it.
+
+        Args:
+            key (Hashable): The key identifying the lookup.
+            function (callable): The lookup to run, without arguments.
+
+        Returns:
+            Any: The result of the lookup, shared by all concurrent callers.
+
+        Raises:
+            Exception: The exception raised by the lookup, re-raised in every concurrent caller.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.calls += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = function()
+        except BaseException as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def forget(self, keys: Iterable[Hashable]):
+        """
+        Detach the lookups in flight for some keys, so that later callers run a new lookup.
+
+        Callers already waiting still receive the result of the detached lookup. This is used
+        after a write that makes a result in flight outdated.
+
+        Args:
+            keys (iterable): The keys to forget.
+        """
+        with self._lock:
+            for key in keys:
+                self._calls.pop(key, None)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Return the counters of the group.
+
+        Returns:
+            dict: The number of lookups run, coalesced, and currently in flight.
+        """
+        with self._lock:
+            return {"calls": self.calls, "coalesced": self.coalesced, "in_flight": len(self._calls)}
@@ -0,0 +1,23 @@
+# conftest.py
+
+import math
+import pytest
+from shortener_app.main import app
+from shortener_app.ratelimit import RateLimitMiddleware
+
+
+@pytest.fixture(autouse=True)
+def reset_rate_limits():
+    """
+    Empty the rate-limit buckets of the application before each test.
+
+    Every `TestClient` request comes from the same "testclient" address, so without this the
+    buckets would be shared by the whole suite and a test could be limited by the ones before it.
+    """
+    middleware = app.middleware_stack
+    while middleware is not None and not isinstance(middleware, RateLimitMiddleware):
+        middleware = getattr(middleware, "app", None)
+    if middleware is not None:
+        for limiter in middleware.limiters.values():
+            limiter.sweep(math.inf)
+    yield
@@ -0,0 +1,65 @@
+# test_aliases.py
+
+import unittest
+from shortener_app.aliases import AliasIndex, is_valid_alias
+
+class TestIsValidAlias(unittest.TestCase):
+
+    def test_valid_aliases(self):
+        """Test that letters, digits, dashes and underscores are accepted."""
+        self.assertTrue(is_valid_alias("spring-sale"))
+        self.assertTrue(is_valid_alias("Sale_2024"))
+
+    def test_invalid_aliases(self):
+        """Test that malformed aliases and application routes are rejected."""
+        self.assertFalse(is_valid_alias("a"))
+        self.assertFalse(is_valid_alias("-sale"))
+        self.assertFalse(is_valid_alias("spring sale"))
+        self.assertFalse(is_valid_alias("spring/sale"))
+        self.assertFalse(is_valid_alias("x" * 65))
+        self.assertFalse(is_valid_alias("Admin"))
+        self.assertFalse(is_valid_alias("docs"))
+
+class TestAliasIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.index = AliasIndex(["ABCDE", "spring-sale", "spring-sale-2", "spring-sale-4", "summer"])
+
+    def test_contains_and_add(self):
+        """Test that added keys are found and not duplicated."""
+        self.assertIn("summer", self.index)
+        self.assertNotIn("spring", self.index)
+        self.index.add("spring")
+        self.index.add("spring")
+        self.assertIn("spring", self.index)
+        self.assertEqual(len(self.index), 6)
+
+    def test_with_prefix(self):
+        """Test that prefix lookups return the matching keys in order, up to the limit."""
+        self.assertEqual(
+            self.index.with_prefix("spring-sale"),
+            ["spring-sale", "spring-sale-2", "spring-sale-4"],
+        )
+        self.assertEqual(self.index.with_prefix("spring-sale-", limit=1), ["spring-sale-2"])
+        self.assertEqual(self.index.with_prefix("winter"), [])
+
+    def test_chunks_stay_sorted_when_split(self):
+        """Test that keys inserted in any order are found and listed in order across chunks."""
+        index = AliasIndex(chunk_size=2)
+        keys = [f"k{i:03d}" for i in range(50)]
+        for key in reversed(keys[::2]):
+            index.add(key)
+        for key in keys[1::2]:
+            index.add(key)
+        self.assertEqual(len(index), 50)
+        self.assertTrue(all(key in index for key in keys))
+        self.assertEqual(index.with_prefix("k", limit=100), keys)
+        self.assertEqual(index.with_prefix("k02", limit=3), ["k020", "k021", "k022"])
+
+    def test_suggest_skips_indexed_and_unavailable_keys(self):
+        """Test that suggestions skip indexed variants and those the database reports as taken."""
+        suggestions = self.index.suggest("spring-sale", lambda candidate: candidate != "spring-sale-3")
+        self.assertEqual(suggestions, ["spring-sale-5", "spring-sale-6", "spring-sale-7"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,168 @@
+# test_backup.py
+
+import gzip
+import os
+import time
+from types import SimpleNamespace
+import pytest
+from sqlalchemy import create_engine, insert
+from shortener_app import backup
+from shortener_app.backup import (
+    BackupError,
+    BackupScheduler,
+    apply_retention,
+    backup_database,
+    list_snapshots,
+    restore_backup,
+    snapshot,
+    sqlite_path,
+    verify_backup,
+)
+from shortener_app.database import init_db
+from shortener_app.models import URL
+
+@pytest.fixture
+def source(tmp_path):
+    """
+    Fixture creating a SQLite database with 500 URL entries, returning its engine.
+    """
+    engine = create_engine(f"sqlite:///{tmp_path}/shortener.db", connect_args={"check_same_thread": False})
+    init_db(bind=engine)
+    with engine.begin() as connection:
+        connection.execute(insert(URL.__table__), [
+            {"key": f"K{i:04d}", "secret_key": f"S{i:07d}", "target_url": f"https://example.com/{i}" * 5}
+            for i in range(500)
+        ])
+    yield engine
+    engine.dispose()
+
+def test_sqlite_path(source):
+    """
+    Test that only engines backed by a SQLite file can be backed up.
+    """
+    assert sqlite_path(source).endswith("shortener.db")
+    with pytest.raises(ValueError):
+        sqlite_path(create_engine("sqlite://"))
+
+def test_compressed_backup_and_verify(tmp_path, source):
+    """
+    Test that a compressed backup copies every page in small steps and verifies.
+    """
+    report = backup_database(sqlite_path(source), str(tmp_path / "backups" / "snap.db"), pages=2, pause=0)
+
+    assert report.destination.endswith("snap.db.gz")
+    assert report.steps > 1
+    assert report.pages > 0
+    assert report.bytes > report.compressed_bytes == os.path.getsize(report.destination)
+    assert report.throughput_mb_s > 0
+    assert report.max_read_lock_ms > 0
+    assert report.attempts == 1 and report.restarts == 0
+    with gzip.open(report.destination, "rb") as packed:
+        assert packed.read(16) == b"SQLite format 3\x00"
+    assert verify_backup(report.destination) == 500
+
+def write_between_steps(monkeypatch, source, writes):
+    """
+    Make another connection commit a URL entry during each of the first `writes` pauses of a
+    backup, as a concurrent writer would, and return the durations of all the pauses.
+    """
+    pauses = []
+
+    def sleep(seconds):
+        if len(pauses) < writes:
+            with source.begin() as connection:
+                connection.execute(insert(URL.__table__), {
+                    "key": f"W{len(pauses)}", "secret_key": f"WS{len(pauses)}", "target_url": "https://example.com"
+                })
+        pauses.append(seconds)
+
+    monkeypatch.setattr(backup, "time", SimpleNamespace(perf_counter=time.perf_counter, sleep=sleep))
+    return pauses
+
+def test_backup_retries_with_smaller_steps_after_concurrent_writes(tmp_path, monkeypatch, source):
+    """
+    Test that concurrent writes restarting the copy too often make the backup retry later with
+    smaller steps and longer pauses, instead of copying the rest in one step.
+    """
+    pauses = write_between_steps(monkeypatch, source, writes=3)
+
+    report = backup_database(
+        sqlite_path(source), str(tmp_path / "snap.db"), pages=2, pause=0.01, max_restarts=2, retry_delay=5,
+        compress=False,
+    )
+
+    assert report.restarts == 3
+    assert report.attempts == 2
+    assert pauses[:4] == [0.01, 0.01, 0.01, 5]
+    assert set(pauses[4:]) == {0.02}
+    assert verify_backup(report.destination) == 503
+
+def test_backup_fails_when_writes_never_stop(tmp_path, monkeypatch, source):
+    """
+    Test that a backup restarted by writes in every attempt fails instead of blocking the writers.
+    """
+    write_between_steps(monkeypatch, source, writes=10 ** 6)
+
+    with pytest.raises(BackupError):
+        backup_database(sqlite_path(source), str(tmp_path / "backups" / "snap.db"), pages=2, max_restarts=1, attempts=2)
+    assert os.listdir(tmp_path / "backups") == []
+
+def test_verify_rejects_corrupted_backup(tmp_path):
+    """
+    Test that a file that is not a database fails verification.
+    """
+    corrupted = tmp_path / "corrupted.db"
+    corrupted.write_bytes(b"not a database" * 100)
+    with pytest.raises(ValueError):
+        verify_backup(str(corrupted))
+
+def test_restore(tmp_path, source):
+    """
+    Test that a snapshot is restored to a new database file, without overwriting by default.
+    """
+    report = backup_database(sqlite_path(source), str(tmp_path / "snap.db"))
+    restored = tmp_path / "restored.db"
+
+    assert restore_backup(report.destination, str(restored)) == 500
+    assert verify_backup(str(restored)) == 500
+    with pytest.raises(FileExistsError):
+        restore_backup(report.destination, str(restored))
+
+    plain = backup_database(sqlite_path(source), str(tmp_path / "plain.db"), compress=False)
+    assert restore_backup(plain.destination, str(restored), overwrite=True) == 500
+    (tmp_path / "corrupted.db").write_bytes(b"not a database" * 100)
+    with pytest.raises(ValueError):
+        restore_backup(str(tmp_path / "corrupted.db"), str(restored), overwrite=True)
+    assert verify_backup(str(restored)) == 500
+    assert sorted(os.listdir(tmp_path)) == ["corrupted.db", "plain.db", "restored.db", "shortener.db", "snap.db.gz"]
+
+def test_snapshot_retention(tmp_path, source):
+    """
+    Test that scheduled snapshots keep only the newest ones of each database.
+    """
+    directory = str(tmp_path / "backups")
+    other = tmp_path / "backups" / "shortener-0-20000101T000000000000.db.gz"
+    reports = [snapshot(sqlite_path(source), directory, retention=2, pause=0) for _ in range(3)]
+    other.write_bytes(b"")
+
+    snapshots = list_snapshots(directory, sqlite_path(source))
+    assert snapshots == [reports[1].destination, reports[2].destination]
+    assert apply_retention(directory, sqlite_path(source), 1) == [reports[1].destination]
+    assert other.exists()
+
+def test_scheduler_takes_requested_snapshots_in_its_thread(tmp_path, source):
+    """
+    Test that a requested snapshot is taken by the scheduler thread, without an interval.
+    """
+    scheduler = BackupScheduler([sqlite_path(source)], 0, directory=str(tmp_path / "backups"), pause=0)
+    scheduler.request_run()
+    try:
+        deadline = time.monotonic() + 10
+        while not scheduler.last_reports and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        scheduler.stop()
+
+    assert [report.source for report in scheduler.last_reports] == [sqlite_path(source)]
+    assert scheduler.last_error is None and not scheduler.running
+    assert verify_backup(scheduler.last_reports[0].destination) == 500
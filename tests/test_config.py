@@ -2,6 +2,7 @@
 
 import unittest
 from unittest.mock import patch
+from pydantic import ValidationError
 from shortener_app.config import Settings, get_settings
 
 class TestSettings(unittest.TestCase):
@@ -44,5 +45,13 @@ class TestSettings(unittest.TestCase):
         self.assertEqual(settings.base_url, "http://localhost:8000")
         self.assertEqual(settings.db_url, "sqlite:///./shortener.db")
 
+    @patch.dict('os.environ', {'DEAD_LINK_POLICY': 'block'})
+    def test_invalid_dead_link_policy(self):
+        """
+        Test that an unknown dead link policy is rejected instead of behaving like "flag".
+        """
+        with self.assertRaises(ValidationError):
+            Settings()
+
 if __name__ == '__main__':
     unittest.main()
@@ -44,6 +44,33 @@ class TestCrudOperations(unittest.TestCase):
         self.assertEqual(result, expected_url)
         self.db.query().filter().first.assert_called_once()
 
+    def test_create_db_url_with_custom_key(self):
+        """Test creating a new URL entry with a custom alias as key."""
+        with unittest.mock.patch('shortener_app.keygen.create_random_key', return_value="12345678"):
+            new_url = crud.create_db_url(self.db, self.mock_url, key="spring-sale")
+
+        self.assertEqual(new_url.key, "spring-sale")
+        self.assertEqual(new_url.secret_key, "12345678")
+
+    def test_is_key_available(self):
+        """Test that a key is available only when no URL entry uses it."""
+        self.db.query = MagicMock()
+        self.db.query().filter().first = MagicMock(return_value=None)
+        self.assertTrue(crud.is_key_available(self.db, "spring-sale"))
+
+        self.db.query().filter().first = MagicMock(return_value=(1,))
+        self.assertFalse(crud.is_key_available(self.db, "spring-sale"))
+
+    def test_get_redirect_by_key(self):
+        """Test retrieving the redirect target of a URL entry by its key."""
+        self.db.query = MagicMock()
+        self.db.query().filter().first = MagicMock(return_value=("http://example.com",))
+
+        result = crud.get_redirect_by_key(self.db, "ABCDE")
+
+        self.assertEqual(result, ("http://example.com",))
+        self.db.query().filter().first.assert_called_once()
+
     def test_get_db_url_by_secret_key(self):
         """Test retrieving a URL entry by its key."""
         key = "ABCDE"
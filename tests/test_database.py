@@ -1,11 +1,14 @@
 # shortener_app/test_database.py
 
 import os
+import subprocess
+import sys
 import pytest
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, inspect
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.exc import IntegrityError
-from shortener_app.database import Base, SessionLocal
+from shortener_app import models
+from shortener_app.database import Base, SessionLocal, init_db
 from shortener_app.models import URL
 
 # Create an in-memory SQLite database for testing
@@ -59,6 +62,7 @@ def test_create_url(db_session):
     assert new_url.target_url == "https://example.com"
     assert new_url.is_active is True
     assert new_url.clicks == 0
+    assert new_url.target_domain == "example.com"
 
 def test_read_url(db_session):
     """
@@ -92,3 +96,67 @@ def test_delete_url(db_session):
     
     deleted_url = db_session.query(URL).filter_by(target_url="https://example.com").first()
     assert deleted_url is None
+
+def test_init_db_adds_missing_columns():
+    """
+    Test that init_db adds the columns and indexes missing from an existing table.
+    """
+    legacy_engine = create_engine("sqlite://")
+    with legacy_engine.begin() as connection:
+        connection.exec_driver_sql(
+            "CREATE TABLE urls (id INTEGER PRIMARY KEY, key VARCHAR, target_url VARCHAR)"
+        )
+        connection.exec_driver_sql(
+            "INSERT INTO urls (key, target_url) VALUES ('ABCDE', 'https://Www.Example.com:8080/page'), ('FGHIJ', 'not a url')"
+        )
+
+    init_db(bind=legacy_engine)
+
+    inspector = inspect(legacy_engine)
+    columns = {column["name"] for column in inspector.get_columns("urls")}
+    indexes = {index["name"] for index in inspector.get_indexes("urls")}
+    assert {"secret_key", "is_active", "clicks", "target_domain"} <= columns
+    assert {"ix_urls_secret_key", "ix_urls_is_active_id", "ix_urls_target_domain_id"} <= indexes
+    with legacy_engine.connect() as connection:
+        domains = connection.exec_driver_sql("SELECT target_domain FROM urls ORDER BY id").scalars().all()
+    assert domains == ["www.example.com", ""]
+
+def test_backfill_commits_each_batch_and_resumes():
+    """
+    Test that the target domain backfill commits one transaction per batch, and that init_db
+    resumes it for the entries still without a domain.
+    """
+    backfilled_engine = create_engine("sqlite://")
+    init_db(bind=backfilled_engine)
+    with backfilled_engine.begin() as connection:
+        connection.exec_driver_sql(
+            "INSERT INTO urls (key, target_url) VALUES ('A', 'https://a.example/'), ('B', 'https://b.example/'), ('C', 'x')"
+        )
+        connection.exec_driver_sql("UPDATE urls SET target_domain = NULL")
+    commits = []
+    event.listen(backfilled_engine, "commit", lambda connection: commits.append(connection))
+
+    assert models.backfill_target_domains(backfilled_engine, batch_size=2) == 3
+    assert len(commits) == 3
+
+    with backfilled_engine.begin() as connection:
+        connection.exec_driver_sql("UPDATE urls SET target_domain = NULL WHERE key = 'B'")
+    init_db(bind=backfilled_engine)
+    with backfilled_engine.connect() as connection:
+        domains = connection.exec_driver_sql("SELECT target_domain FROM urls ORDER BY id").scalars().all()
+    assert domains == ["a.example", "b.example", ""]
+
+def test_migrate_command_creates_the_schema(tmp_path):
+    """
+    Test that `python -m shortener_app.migrate` creates the tables and indexes of a new database.
+    """
+    path = tmp_path / "migrated.db"
+    subprocess.run(
+        [sys.executable, "-m", "shortener_app.migrate"],
+        env={**os.environ, "DB_URL": f"sqlite:///{path}", "SHARD_COUNT": "1"},
+        cwd=tmp_path,
+        check=True,
+    )
+    inspector = inspect(create_engine(f"sqlite:///{path}"))
+    assert "urls" in inspector.get_table_names()
+    assert "ix_urls_is_active_id" in {index["name"] for index in inspector.get_indexes("urls")}
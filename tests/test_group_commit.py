@@ -0,0 +1,134 @@
+# test_group_commit.py
+
+import threading
+from concurrent.futures import TimeoutError
+import pytest
+from sqlalchemy import create_engine, event, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import sessionmaker
+from shortener_app import crud, schemas
+from shortener_app.database import init_db
+from shortener_app.group_commit import GroupCommitWriter
+from shortener_app.models import URL
+
+@pytest.fixture
+def engine(tmp_path):
+    """
+    Fixture creating a migrated SQLite database counting its commits.
+    """
+    engine = create_engine(f"sqlite:///{tmp_path}/group.db", connect_args={"check_same_thread": False})
+    init_db(bind=engine)
+    engine.commits = 0
+
+    @event.listens_for(engine, "commit")
+    def count_commit(connection):
+        engine.commits += 1
+
+    yield engine
+    engine.dispose()
+
+@pytest.fixture
+def writer(engine):
+    """
+    Fixture providing a writer with a long delay, so concurrent submissions share a batch.
+    """
+    writer = GroupCommitWriter(sessionmaker(bind=engine), max_delay=0.2, max_batch=8)
+    yield writer
+    writer.stop(timeout=5)
+
+def build(index):
+    return crud.build_db_url(schemas.URLBase(target_url=f"https://example.com/{index}"))
+
+def test_concurrent_creations_share_commits(engine, writer):
+    """
+    Test that concurrent creations are committed in batches and each gets its own row.
+    """
+    results = []
+    threads = [threading.Thread(target=lambda i=i: results.append(writer.create(build(i)))) for i in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len({db_url.id for db_url in results}) == 16
+    assert all(db_url.is_active and db_url.clicks == 0 for db_url in results)
+    with engine.connect() as connection:
+        assert len(connection.execute(select(URL.id)).all()) == 16
+
+    stats = writer.stats()
+    assert stats["rows"] == 16
+    assert stats["max_batch_size"] <= 8
+    assert stats["batches"] == engine.commits < 16
+
+def test_conflicting_entry_fails_alone(writer):
+    """
+    Test that a duplicate key only fails its own request, not the rest of its batch.
+    """
+    taken = writer.create(build(0))
+    futures = [writer.submit(build(1)), writer.submit(URL(target_url="https://example.com", key=taken.key, secret_key="OTHER001")), writer.submit(build(2))]
+
+    assert futures[0].result().id is not None
+    with pytest.raises(IntegrityError):
+        futures[1].result()
+    assert futures[2].result().id is not None
+    # The entries retried one by one are recorded as batches of one
+    stats = writer.stats()
+    assert stats["rows"] == 3
+    assert stats["max_batch_size"] == 1
+
+def test_failed_batch_does_not_stop_the_writer(engine):
+    """
+    Test that an error outside of the inserts fails its batch and the writer keeps serving.
+    """
+    factory = sessionmaker(bind=engine)
+    calls = []
+
+    def flaky_factory(**options):
+        calls.append(options)
+        if len(calls) == 1:
+            raise RuntimeError("connection lost")
+        return factory(**options)
+
+    writer = GroupCommitWriter(flaky_factory, max_delay=0, timeout=5)
+    try:
+        with pytest.raises(RuntimeError):
+            writer.create(build(0))
+        assert writer.create(build(1)).id is not None
+    finally:
+        writer.stop(timeout=5)
+
+def test_stop_commits_queued_entries(writer):
+    """
+    Test that stopping the writer commits the entries already queued.
+    """
+    future = writer.submit(build(0))
+    writer.stop(timeout=5)
+    assert future.result(timeout=1).id is not None
+
+def test_timed_out_entry_is_never_inserted(engine):
+    """
+    Test that an entry whose request timed out is withdrawn instead of being committed later.
+    """
+    factory = sessionmaker(bind=engine)
+    entered, release = threading.Event(), threading.Event()
+
+    def slow_factory(**options):
+        # Hold the writer on the first batch until the second request has given up
+        entered.set()
+        release.wait(5)
+        return factory(**options)
+
+    writer = GroupCommitWriter(slow_factory, max_delay=0, timeout=0.1)
+    try:
+        first = writer.submit(build(0))
+        assert entered.wait(5)
+        with pytest.raises(TimeoutError):
+            writer.create(build(1))
+        release.set()
+        assert first.result(timeout=5).id is not None
+    finally:
+        writer.stop(timeout=5)
+
+    with engine.connect() as connection:
+        assert connection.execute(select(URL.target_url)).scalars().all() == ["https://example.com/0"]
+    assert writer.stats()["rows"] == 1
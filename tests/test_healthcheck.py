@@ -0,0 +1,208 @@
+# test_healthcheck.py
+
+import asyncio
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import sessionmaker
+from shortener_app import crud
+from shortener_app.database import init_db
+from shortener_app.healthcheck import LinkClient, LinkHealthChecker, is_failure, is_public_address
+from shortener_app.models import URL
+
+class StubHandler(BaseHTTPRequestHandler):
+    """
+    A keep-alive HTTP server answering with the status given by the path.
+    """
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def answer(self, with_body):
+        path = self.path.split("?")[0]
+        if path == "/slow":
+            time.sleep(1)
+        if path == "/no-head" and self.command == "HEAD":
+            status = 405
+        elif path.startswith("/status/"):
+            status = int(path.rsplit("/", 1)[-1])
+        else:
+            status = 200
+        body = b"x" * 100
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if with_body:
+            self.wfile.write(body)
+
+    def do_HEAD(self):
+        self.answer(with_body=False)
+
+    def do_GET(self):
+        self.answer(with_body=True)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def stub_server():
+    """
+    Fixture running the stub HTTP server on a free local port, returning its base URL.
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.connections = 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def base_url(server):
+    return f"http://127.0.0.1:{server.server_address[1]}"
+
+def check(urls, **options):
+    # The stub server listens on the loopback interface, refused by default
+    options.setdefault("allow_private", True)
+
+    async def run():
+        async with LinkClient(**options) as client:
+            results = await asyncio.gather(*(client.check(url) for url in urls))
+            return results, client
+    return asyncio.run(run())
+
+def test_is_failure():
+    """
+    Test which statuses count as failures of a link.
+    """
+    assert [is_failure(status) for status in (0, 200, 301, 403, 404, 410, 429, 503)] == [
+        True, False, False, False, True, True, False, True
+    ]
+
+def test_is_public_address():
+    """
+    Test which addresses the checker may connect to.
+    """
+    assert is_public_address("93.184.216.34") and is_public_address("2606:2800:220:1::1")
+    for address in ("127.0.0.1", "10.1.2.3", "192.168.0.1", "169.254.169.254", "100.64.0.1", "0.0.0.0",
+                    "240.0.0.1", "224.0.0.1", "::1", "fe80::1%eth0", "fc00::1", "::ffff:127.0.0.1"):
+        assert not is_public_address(address), address
+
+def test_client_refuses_non_public_targets(stub_server):
+    """
+    Test that targets resolving to non-public addresses are refused without connecting.
+    """
+    url = base_url(stub_server)
+    urls = [f"{url}/a", f"http://localhost:{stub_server.server_address[1]}/", "http://169.254.169.254/latest/meta-data/"]
+    results, client = check(urls, allow_private=False, per_host_delay=0)
+
+    assert [result.status for result in results] == [0, 0, 0]
+    assert all("non-public" in result.error for result in results)
+    assert client.connections_opened == stub_server.connections == 0
+
+def test_client_reuses_connections_per_host(stub_server):
+    """
+    Test that sequential checks of the same host share one keep-alive connection.
+    """
+    url = base_url(stub_server)
+    results, client = check(
+        [f"{url}/a", f"{url}/status/404", f"{url}/status/500", f"{url}/no-head", f"{url}/b?q=1"],
+        per_host_concurrency=1,
+        per_host_delay=0,
+    )
+
+    assert [result.status for result in results] == [200, 404, 500, 200, 200]
+    assert client.connections_opened == stub_server.connections == 1
+    assert client.requests == 6
+
+def test_client_spaces_requests_to_the_same_host(stub_server):
+    """
+    Test that requests to the same host start at least the politeness delay apart.
+    """
+    url = base_url(stub_server)
+    start = time.monotonic()
+    results, _ = check([f"{url}/{i}" for i in range(4)], per_host_concurrency=4, per_host_delay=0.05)
+
+    assert all(result.status == 200 for result in results)
+    assert time.monotonic() - start >= 0.15
+
+def test_client_reports_unreachable_targets(stub_server):
+    """
+    Test that timeouts, refused connections and unsupported URLs are reported with status 0.
+    """
+    url = base_url(stub_server)
+    results, _ = check([f"{url}/slow", "http://127.0.0.1:9/", "ftp://example.com/"], timeout=0.2, per_host_delay=0)
+
+    assert [result.status for result in results] == [0, 0, 0]
+    assert all(result.failed and result.error for result in results)
+
+def test_checker_records_health_by_clicks(tmp_path, stub_server):
+    """
+    Test that a batch checks the most clicked due links and records their health.
+    """
+    engine = create_engine(f"sqlite:///{tmp_path}/shortener.db", connect_args={"check_same_thread": False})
+    init_db(bind=engine)
+    url = base_url(stub_server)
+    with engine.begin() as connection:
+        connection.execute(insert(URL.__table__), [
+            {"key": "OK", "secret_key": "S1", "target_url": f"{url}/ok", "clicks": 30, "is_active": True},
+            {"key": "GONE", "secret_key": "S2", "target_url": f"{url}/status/410", "clicks": 20, "is_active": True},
+            {"key": "COLD", "secret_key": "S3", "target_url": f"{url}/cold", "clicks": 1, "is_active": True},
+            {"key": "OFF", "secret_key": "S4", "target_url": f"{url}/off", "clicks": 99, "is_active": False},
+        ])
+    checker = LinkHealthChecker(
+        sessionmaker(bind=engine), interval=0, batch_size=2, per_host_delay=0, per_host_concurrency=1,
+        allow_private=True,
+    )
+
+    assert checker.run_once()["checked"] == 2
+    report = checker.run_once()
+    assert report["checked"] == 1 and report["failed"] == 0
+    assert checker.run_once()["checked"] == 0
+
+    with engine.connect() as connection:
+        rows = {
+            row.key: row
+            for row in connection.execute(select(URL.key, URL.last_status, URL.last_checked_at, URL.check_failures))
+        }
+    assert (rows["OK"].last_status, rows["OK"].check_failures) == (200, 0)
+    assert (rows["GONE"].last_status, rows["GONE"].check_failures) == (410, 1)
+    assert rows["COLD"].last_status == 200
+    assert rows["OFF"].last_checked_at is None
+
+    db = sessionmaker(bind=engine)()
+    crud.record_link_checks(db, {"GONE": 410, "OK": 200}, ["GONE"], datetime(2030, 1, 1))
+    assert crud.get_redirect_by_key(db, "GONE").check_failures == 2
+    assert crud.get_redirect_by_key(db, "OK").check_failures == 0
+    db.close()
+    engine.dispose()
+
+def test_checker_runs_requested_batches_in_its_thread(tmp_path, stub_server):
+    """
+    Test that a requested batch is checked by the checker thread, without an interval.
+    """
+    engine = create_engine(f"sqlite:///{tmp_path}/shortener.db", connect_args={"check_same_thread": False})
+    init_db(bind=engine)
+    with engine.begin() as connection:
+        connection.execute(insert(URL.__table__), {
+            "key": "OK", "secret_key": "S1", "target_url": f"{base_url(stub_server)}/ok", "is_active": True
+        })
+    checker = LinkHealthChecker(sessionmaker(bind=engine), interval=0, per_host_delay=0, allow_private=True)
+    checker.request_run()
+    try:
+        deadline = time.monotonic() + 10
+        while checker.last_report is None and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        checker.stop()
+        engine.dispose()
+
+    assert checker.last_report["checked"] == 1
+    assert checker.last_error is None and not checker.running
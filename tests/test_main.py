@@ -1,16 +1,27 @@
 # shortener_app/test_main.py
 
 import pytest
+import time
+import uuid
+from datetime import datetime
 from unittest.mock import patch
 from fastapi import Request
 from fastapi.testclient import TestClient
-from shortener_app.main import app, raise_bad_request, raise_not_found
+from shortener_app.main import app, get_backup_scheduler, get_link_checker, settings, raise_bad_request, raise_not_found
+from shortener_app.database import SessionLocal, init_db
+from shortener_app.healthcheck import LinkHealthChecker
 import shortener_app.schemas as schema
 import shortener_app.crud as crud
 
 # Create a TestClient instance for testing the FastAPI app
 client = TestClient(app)
 
+def setup_module():
+    """
+    Create the database schema, as the startup event only runs inside a client context.
+    """
+    init_db()
+
 # Dummy data for testing
 dummy_url_info = {
     "target_url": "https://example.com",
@@ -70,6 +81,262 @@ def test_create_url_invalid():
     # Assert that the response detail contains the expected error message
     assert response.json() == {"detail": "Your provided URL is not valid"}
 
+def test_create_url_with_custom_alias():
+    """
+    Test the URL creation endpoint ("/url") with a custom alias.
+
+    This function reserves a new alias and checks:
+    - The alias is used as the short key of the created URL.
+    - Reserving the same alias again returns 409 (Conflict) with suggestions.
+    - The alias availability endpoint reports it as taken.
+    """
+    alias = f"sale-{uuid.uuid4().hex[:8]}"
+
+    response = client.post("/url", json={"target_url": "https://example.com", "custom_key": alias})
+    assert response.status_code == 200
+    assert response.json()["url"].endswith(f"/{alias}")
+
+    response = client.post("/url", json={"target_url": "https://example.com", "custom_key": alias})
+    assert response.status_code == 409
+    assert response.json()["detail"]["suggestions"] == [f"{alias}-2", f"{alias}-3", f"{alias}-4"]
+
+    response = client.get(f"/alias/{alias}")
+    assert response.status_code == 200
+    assert response.json()["available"] is False
+
+def test_create_url_retries_random_key_collisions():
+    """
+    Test that a random key colliding with an existing key is replaced by a new one.
+
+    This function creates a URL, then makes the key generator return its key first and checks:
+    - The creation succeeds with the next random key instead of failing.
+    """
+    existing = client.post("/url", json={"target_url": "https://example.com/first"}).json()
+    existing_key = existing["url"].rsplit("/", 1)[-1]
+    fresh = [existing_key, uuid.uuid4().hex[:8], uuid.uuid4().hex[:5], uuid.uuid4().hex[:8]]
+    with patch("shortener_app.keygen.create_random_key", side_effect=fresh):
+        response = client.post("/url", json={"target_url": "https://example.com/second"})
+    assert response.status_code == 200
+    assert response.json()["url"].endswith("/" + fresh[2])
+
+def test_create_url_with_alias_retries_secret_key_collisions():
+    """
+    Test that a secret key collision while creating an alias is not answered as a taken alias.
+
+    This function creates a URL, then makes the key generator return its secret key first and checks:
+    - The alias is created with the next secret key instead of failing with 409 (Conflict).
+    """
+    existing = client.post("/url", json={"target_url": "https://example.com/first"}).json()
+    alias = f"promo-{uuid.uuid4().hex[:8]}"
+    fresh = [existing["admin_url"].rsplit("/", 1)[-1], uuid.uuid4().hex[:8]]
+    with patch("shortener_app.keygen.create_random_key", side_effect=fresh):
+        response = client.post("/url", json={"target_url": "https://example.com/second", "custom_key": alias})
+    assert response.status_code == 200
+    assert response.json()["url"].endswith("/" + alias)
+    assert response.json()["admin_url"].endswith("/" + fresh[1])
+
+def test_create_url_group_commit_timeout():
+    """
+    Test that a creation the group-commit writer did not take in time is answered 503 (Service Unavailable).
+    """
+    with patch("shortener_app.main.group_commit_writer") as writer:
+        writer.create.side_effect = TimeoutError()
+        response = client.post("/url", json={"target_url": "https://example.com/busy"})
+    assert response.status_code == 503
+
+def test_check_alias():
+    """
+    Test the alias availability endpoint ("/alias/{alias}").
+
+    This function checks:
+    - A new alias is reported as available.
+    - An invalid or reserved alias is rejected with 400 (Bad Request).
+    """
+    alias = f"sale-{uuid.uuid4().hex[:8]}"
+    response = client.get(f"/alias/{alias}")
+    assert response.json() == {"alias": alias, "available": True, "suggestions": []}
+
+    assert client.get("/alias/admin").status_code == 400
+    response = client.post("/url", json={"target_url": "https://example.com", "custom_key": "a b"})
+    assert response.status_code == 400
+
+def test_forward_to_target_url():
+    """
+    Test the redirect endpoint ("/{url_key}").
+
+    This function creates a shortened URL and checks:
+    - Requesting its key redirects to the target URL.
+    - The click is counted in the administration info.
+    - An unknown key returns 404 (Not Found).
+    """
+    created = client.post("/url", json={"target_url": "https://example.com/redirect"}).json()
+    key = created["url"].rsplit("/", 1)[-1]
+
+    response = client.get(f"/{key}", allow_redirects=False)
+    assert response.status_code == 307
+    assert response.headers["location"] == "https://example.com/redirect"
+
+    admin_path = created["admin_url"].split("8000", 1)[-1]
+    assert client.get(admin_path).json()["clicks"] == 1
+    assert client.get("/unknown-key").status_code == 404
+
+def test_redirect_to_dead_link():
+    """
+    Test the redirect endpoint ("/{url_key}") for a target the link-health checker found dead.
+
+    This function records failed checks for a shortened URL and checks:
+    - With the "flag" policy, the redirect carries an `X-Link-Health: dead` header.
+    - With the "skip" policy, the redirect is refused with 410 (Gone).
+    """
+    created = client.post("/url", json={"target_url": "https://example.com/dead"}).json()
+    key = created["url"].rsplit("/", 1)[-1]
+    db = SessionLocal()
+    try:
+        crud.record_link_checks(db, {key: 404}, [key], datetime(2030, 1, 1))
+        assert "x-link-health" not in client.get(f"/{key}", allow_redirects=False).headers
+        for _ in range(settings.dead_link_failures - 1):
+            crud.record_link_checks(db, {key: 404}, [key], datetime(2030, 1, 1))
+    finally:
+        db.close()
+
+    flagged = client.get(f"/{key}", allow_redirects=False)
+    assert flagged.status_code == 307
+    assert flagged.headers["x-link-health"] == "dead"
+    with patch.object(settings, "dead_link_policy", "skip"):
+        assert client.get(f"/{key}", allow_redirects=False).status_code == 410
+
+def test_get_stats():
+    """
+    Test the admin statistics endpoint ("/admin/stats").
+
+    This function checks:
+    - The endpoint is forbidden without the admin key.
+    - With the admin key, it reports the coalesced lookup counters.
+    """
+    assert client.get("/admin/stats").status_code == 403
+    with patch.object(settings, "admin_api_key", "admin-secret"):
+        assert client.get("/admin/stats", headers={"X-Admin-Key": "wrong"}).status_code == 403
+        response = client.get("/admin/stats", headers={"X-Admin-Key": "admin-secret"})
+    assert response.status_code == 200
+    assert set(response.json()["key_lookups"]) == {"calls", "coalesced", "in_flight"}
+
+def test_backup_runs_in_the_background(tmp_path):
+    """
+    Test the backup endpoints ("/admin/backup").
+
+    This function checks:
+    - POST answers 202 (Accepted) at once, the snapshots being taken by the scheduler thread.
+    - GET then reports the snapshot of the database.
+    """
+    headers = {"X-Admin-Key": "admin-secret"}
+    get_backup_scheduler.cache_clear()
+    with patch.object(settings, "admin_api_key", "admin-secret"), patch.object(settings, "backup_dir", str(tmp_path)):
+        try:
+            response = client.post("/admin/backup", headers=headers)
+            deadline = time.monotonic() + 10
+            while not get_backup_scheduler().last_reports and time.monotonic() < deadline:
+                time.sleep(0.01)
+            status = client.get("/admin/backup", headers=headers).json()
+        finally:
+            get_backup_scheduler().stop()
+            get_backup_scheduler.cache_clear()
+    assert response.status_code == 202
+    assert response.json() == {"accepted": True, "running": False}
+    assert status["error"] is None
+    assert [backup["destination"].startswith(str(tmp_path)) for backup in status["backups"]] == [True]
+
+def test_link_check_runs_in_the_background():
+    """
+    Test the link-check endpoints ("/admin/links/check").
+
+    This function checks:
+    - POST answers 202 (Accepted) at once, the batch being checked by the checker thread.
+    - GET then reports the last batch.
+    """
+    headers = {"X-Admin-Key": "admin-secret"}
+    report = {"checked": 0, "failed": 0, "connections": 0, "requests": 0}
+    get_link_checker.cache_clear()
+    with patch.object(settings, "admin_api_key", "admin-secret"), \
+            patch.object(LinkHealthChecker, "run_once", autospec=True, side_effect=lambda checker: setattr(checker, "last_report", report)):
+        try:
+            response = client.post("/admin/links/check", headers=headers)
+            deadline = time.monotonic() + 10
+            while (get_link_checker().last_report is None or get_link_checker().running) and time.monotonic() < deadline:
+                time.sleep(0.01)
+            status = client.get("/admin/links/check", headers=headers).json()
+        finally:
+            get_link_checker().stop()
+            get_link_checker.cache_clear()
+    assert response.status_code == 202
+    assert response.json() == {"accepted": True, "running": False}
+    assert status == {"running": False, "last_report": report, "error": None}
+
+
+    """
+    Test the admin listing endpoint ("/admin/urls").
+
+    This function creates URLs on a dedicated domain and checks:
+    - The endpoint is forbidden without the admin key.
+    - The pages, chained through their cursors, list every matching URL once.
+    - A malformed cursor returns 400 (Bad Request).
+    """
+    domain = f"{uuid.uuid4().hex[:12]}.example.org"
+    created = {
+        client.post("/url", json={"target_url": f"https://{domain}/{i}"}).json()["url"]
+        for i in range(3)
+    }
+    assert client.get("/admin/urls").status_code == 403
+
+    listed, params = [], {"domain": domain, "limit": 2}
+    with patch.object(settings, "admin_api_key", "admin-secret"):
+        while True:
+            page = client.get("/admin/urls", params=params, headers={"X-Admin-Key": "admin-secret"}).json()
+            listed.extend(url["url"] for url in page["urls"])
+            if page["next_cursor"] is None:
+                break
+            params["cursor"] = page["next_cursor"]
+        response = client.get("/admin/urls", params={"cursor": "nope"}, headers={"X-Admin-Key": "admin-secret"})
+    assert sorted(listed) == sorted(created)
+    assert response.status_code == 400
+
+def test_bulk_endpoints():
+    """
+    Test the bulk admin endpoints ("/admin/bulk/deactivate" and "/admin/bulk/info").
+
+    This function creates URLs and checks:
+    - The endpoints are forbidden without the admin key.
+    - The information of many URLs is returned with a status per secret key.
+    - Deactivation by secret keys and by domain reports an outcome per secret key.
+    - An empty domain is rejected.
+    """
+    domain = f"{uuid.uuid4().hex[:12]}.example.net"
+    created = [client.post("/url", json={"target_url": f"https://{domain}/{i}"}).json() for i in range(3)]
+    secret_keys = [url["admin_url"].rsplit("/", 1)[-1] for url in created]
+    assert client.post("/admin/bulk/info", json={"secret_keys": secret_keys}).status_code == 403
+
+    headers = {"X-Admin-Key": "admin-secret"}
+    with patch.object(settings, "admin_api_key", "admin-secret"):
+        info = client.post("/admin/bulk/info", json={"secret_keys": [secret_keys[0], "UNKNOWN1"]}, headers=headers)
+        by_keys = client.post("/admin/bulk/deactivate", json={"secret_keys": secret_keys[:1]}, headers=headers)
+        by_domain = client.post("/admin/bulk/deactivate", json={"domain": domain}, headers=headers)
+        neither = client.post("/admin/bulk/deactivate", json={}, headers=headers)
+        empty_domain = client.post("/admin/bulk/deactivate", json={"domain": " "}, headers=headers)
+
+    assert info.json()["results"] == [
+        {"secret_key": secret_keys[0], "status": "found", "info": created[0]},
+        {"secret_key": "UNKNOWN1", "status": "not_found"},
+    ]
+    assert by_keys.json() == {
+        "deactivated": 1,
+        "more": False,
+        "results": [{"secret_key": secret_keys[0], "status": "deactivated"}],
+    }
+    assert by_domain.json()["deactivated"] == 2 and by_domain.json()["more"] is False
+    assert {result["secret_key"] for result in by_domain.json()["results"]} == set(secret_keys[1:])
+    assert neither.status_code == 400
+    assert empty_domain.status_code == 422
+    assert client.get(created[1]["url"].split("8000", 1)[-1], allow_redirects=False).status_code == 404
+
 def test_raise_bad_request():
     """
     Test the raise_bad_request function.
@@ -0,0 +1,99 @@
+# test_profiling.py
+
+import logging
+import threading
+import time
+from unittest.mock import patch
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from shortener_app.main import app, settings
+from shortener_app.profiling import SamplingProfiler, SlowRequestMiddleware, install_sql_capture
+
+def busy_function(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+def test_sampling_profiler_collapsed_stacks():
+    """
+    Test that the profiler samples other threads and reports collapsed stacks.
+    """
+    stop = threading.Event()
+    worker = threading.Thread(target=busy_function, args=(stop,))
+    worker.start()
+    profiler = SamplingProfiler(interval=0.001)
+    try:
+        profiler.start()
+        time.sleep(0.1)
+        output = profiler.stop()
+    finally:
+        stop.set()
+        worker.join()
+
+    assert profiler.samples > 0
+    assert not profiler.running
+    line = next(line for line in output.splitlines() if "busy_function" in line)
+    stack, count = line.rsplit(" ", 1)
+    assert int(count) > 0
+    assert stack.split(";")[-1].startswith("busy_function (test_profiling.py:")
+
+def test_sampling_profiler_stops_after_duration():
+    """
+    Test that the profiler stops on its own after the requested duration.
+    """
+    profiler = SamplingProfiler(interval=0.001)
+    profiler.start(duration=0.05)
+    time.sleep(0.3)
+    assert not profiler.running
+
+def build_client(threshold):
+    """
+    Build a client of an application timed by SlowRequestMiddleware, running one SQL statement.
+    """
+    engine = create_engine("sqlite://")
+    install_sql_capture(engine)
+    timed_app = FastAPI()
+
+    @timed_app.get("/query")
+    def query():
+        with engine.connect() as connection:
+            connection.exec_driver_sql("SELECT 42").scalar()
+        return "done"
+
+    timed_app.add_middleware(SlowRequestMiddleware, threshold=threshold)
+    return TestClient(timed_app)
+
+def test_slow_request_logged_with_sql(caplog):
+    """
+    Test that a request above the threshold is logged with its SQL statements.
+    """
+    with caplog.at_level(logging.WARNING, logger="shortener_app.profiling"):
+        build_client(threshold=0.0).get("/query")
+    assert "Slow request: GET /query -> 200" in caplog.text
+    assert "1 SQL statements" in caplog.text
+    assert "SELECT 42" in caplog.text
+
+def test_fast_request_not_logged(caplog):
+    """
+    Test that a request below the threshold is not logged.
+    """
+    with caplog.at_level(logging.WARNING, logger="shortener_app.profiling"):
+        build_client(threshold=60.0).get("/query")
+    assert caplog.text == ""
+
+def test_profiler_endpoints():
+    """
+    Test that the profiler endpoints require the admin key and return collapsed stacks.
+    """
+    client = TestClient(app)
+    assert client.post("/admin/profiler/start").status_code == 403
+    headers = {"X-Admin-Key": "admin-secret"}
+    with patch.object(settings, "admin_api_key", "admin-secret"):
+        assert client.post("/admin/profiler/start?seconds=0", headers=headers).status_code == 400
+        assert client.post("/admin/profiler/start?seconds=5&interval_ms=1", headers=headers).status_code == 200
+        assert client.post("/admin/profiler/start", headers=headers).status_code == 409
+        time.sleep(0.05)
+        response = client.post("/admin/profiler/stop", headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert response.text.endswith("\n")
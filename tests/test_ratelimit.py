@@ -0,0 +1,123 @@
+# test_ratelimit.py
+
+import unittest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from shortener_app import ratelimit
+from shortener_app.ratelimit import TokenBucketLimiter, RateLimitMiddleware, classify_request
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTokenBucketLimiter(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.limiter = TokenBucketLimiter(rate=1.0, capacity=3, sweep_interval=10.0, clock=self.clock)
+
+    def test_burst_then_reject(self):
+        """Test that a client can spend its burst and is then told how long to wait."""
+        for _ in range(3):
+            self.assertEqual(self.limiter.acquire("a"), 0.0)
+        self.assertAlmostEqual(self.limiter.acquire("a"), 1.0)
+
+    def test_refill(self):
+        """Test that tokens are refilled according to the rate."""
+        for _ in range(3):
+            self.limiter.acquire("a")
+        self.clock.now = 1.5
+        self.assertEqual(self.limiter.acquire("a"), 0.0)
+        self.assertAlmostEqual(self.limiter.acquire("a"), 0.5)
+
+    def test_clients_are_independent(self):
+        """Test that each client has its own bucket."""
+        for _ in range(3):
+            self.limiter.acquire("a")
+        self.assertEqual(self.limiter.acquire("b"), 0.0)
+
+    def test_sweep_drops_full_buckets(self):
+        """Test that idle buckets are removed once they are full again."""
+        self.limiter.acquire("a")
+        self.clock.now = 8.0
+        self.limiter.acquire("b")
+        self.clock.now = 10.0
+        self.limiter.acquire("c")
+        self.assertEqual(len(self.limiter), 2)
+
+    def test_invalid_parameters(self):
+        """Test that a non-positive rate is rejected."""
+        with self.assertRaises(ValueError):
+            TokenBucketLimiter(rate=0, capacity=1)
+
+
+class TestClassifyRequest(unittest.TestCase):
+
+    def test_categories(self):
+        """Test that requests are mapped to the expected categories."""
+        self.assertEqual(classify_request("POST", "/url"), ratelimit.CREATE)
+        self.assertEqual(classify_request("GET", "/admin/ABCDEFGH"), ratelimit.ADMIN)
+        self.assertEqual(classify_request("DELETE", "/admin/ABCDEFGH"), ratelimit.ADMIN)
+        self.assertEqual(classify_request("GET", "/ABCDE"), ratelimit.REDIRECT)
+        self.assertIsNone(classify_request("GET", "/"))
+        self.assertIsNone(classify_request("GET", "/docs/oauth2-redirect"))
+
+    def test_alias_checks_are_reads(self):
+        """Test that alias availability checks share the redirect bucket, not the creation one."""
+        self.assertEqual(classify_request("GET", "/alias/spring-sale"), ratelimit.REDIRECT)
+        self.assertEqual(classify_request("POST", "/url"), ratelimit.CREATE)
+
+    def test_documentation_is_not_limited(self):
+        """Test that the documentation pages and the favicon are not taken for short keys."""
+        for path in ("/docs", "/redoc", "/openapi.json", "/favicon.ico"):
+            self.assertIsNone(classify_request("GET", path), path)
+        self.assertEqual(classify_request("GET", "/docsx"), ratelimit.REDIRECT)
+
+
+class TestRateLimitMiddleware(unittest.TestCase):
+
+    def setUp(self):
+        app = FastAPI()
+
+        @app.get("/{url_key}")
+        def redirect(url_key: str):
+            return url_key
+
+        app.add_middleware(RateLimitMiddleware, limits={ratelimit.REDIRECT: (0.5, 2)}, api_keys={"secret"})
+        self.client = TestClient(app)
+
+    def test_too_many_requests(self):
+        """Test that the middleware answers 429 with a Retry-After header."""
+        self.assertEqual(self.client.get("/ABCDE").status_code, 200)
+        self.assertEqual(self.client.get("/ABCDE").status_code, 200)
+        response = self.client.get("/ABCDE")
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.headers["Retry-After"], "2")
+
+    def test_api_key_has_its_own_bucket(self):
+        """Test that clients sending an API key are limited separately from their IP."""
+        self.client.get("/ABCDE")
+        self.client.get("/ABCDE")
+        response = self.client.get("/ABCDE", headers={"X-API-Key": "secret"})
+        self.assertEqual(response.status_code, 200)
+
+    def test_unknown_api_key_does_not_reset_the_limit(self):
+        """Test that random API keys are limited by the IP address of the client."""
+        self.client.get("/ABCDE")
+        self.client.get("/ABCDE")
+        for key in ("random-1", "random-2", "random-3"):
+            response = self.client.get("/ABCDE", headers={"X-API-Key": key})
+            self.assertEqual(response.status_code, 429)
+
+    def test_parse_api_keys(self):
+        """Test that the configured API keys are split on commas."""
+        self.assertEqual(ratelimit.parse_api_keys(" a, b,,"), frozenset({"a", "b"}))
+        self.assertEqual(ratelimit.parse_api_keys(""), frozenset())
+
+if __name__ == '__main__':
+    unittest.main()
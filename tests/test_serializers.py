@@ -0,0 +1,56 @@
+# test_serializers.py
+
+import json
+from fastapi.encoders import jsonable_encoder
+from shortener_app import models, schemas
+from shortener_app.serializers import FastJSONResponse, URLInfoSerializer, json_dumps
+
+serializer = URLInfoSerializer("http://localhost:8000", "/admin/")
+
+def make_url(index=0):
+    return models.URL(
+        key=f"KEY{index:02d}",
+        secret_key=f"SECRET{index:02d}",
+        target_url="https://example.com/été",
+        is_active=True,
+        clicks=index,
+    )
+
+def test_to_dict_matches_url_info():
+    """
+    Test that the serializer produces the same fields as the URLInfo response model.
+    """
+    db_url = make_url(3)
+    expected = schemas.URLInfo(
+        target_url=db_url.target_url,
+        is_active=True,
+        clicks=3,
+        url="http://localhost:8000/KEY03",
+        admin_url="http://localhost:8000/admin/SECRET03",
+    )
+    assert serializer.to_dict(db_url) == jsonable_encoder(expected)
+    assert list(serializer.to_dict(db_url)) == list(schemas.URLInfo.__fields__)
+
+def test_base_url_path_is_ignored():
+    """
+    Test that only the scheme and host of the base URL are used, as with URL.replace(path=...).
+    """
+    prefixed = URLInfoSerializer("https://sho.rt/ignored/", "/admin/")
+    assert prefixed.to_dict(make_url())["url"] == "https://sho.rt/KEY00"
+
+def test_to_dicts():
+    """
+    Test that batch serialization gives the same result as one row at a time.
+    """
+    rows = [make_url(index) for index in range(5)]
+    assert serializer.to_dicts(rows) == [serializer.to_dict(row) for row in rows]
+
+def test_json_dumps_and_response():
+    """
+    Test that the encoded JSON round-trips and is served with the JSON media type.
+    """
+    content = serializer.to_dict(make_url())
+    assert json.loads(json_dumps(content)) == content
+    response = FastJSONResponse(content)
+    assert response.media_type == "application/json"
+    assert json.loads(response.body) == content
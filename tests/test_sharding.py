@@ -0,0 +1,328 @@
+# test_sharding.py
+
+import pytest
+from sqlalchemy import create_engine, event, not_, or_, select
+from shortener_app import crud, keygen, schemas
+from shortener_app.group_commit import GroupCommitWriter
+from shortener_app.database import init_db
+from shortener_app.models import URL
+from shortener_app.sharding import (
+    ShardRouter,
+    create_shard_engines,
+    create_sharded_sessionmaker,
+    rebalance,
+    shard_for_key,
+    shard_urls,
+)
+
+@pytest.fixture
+def shard_engines(tmp_path):
+    """
+    Fixture creating three migrated SQLite shards in a temporary directory.
+    """
+    engines = create_shard_engines(f"sqlite:///{tmp_path}/shortener.db", 3)
+    for engine in engines.values():
+        init_db(bind=engine)
+    yield engines
+    for engine in engines.values():
+        engine.dispose()
+
+@pytest.fixture
+def db(shard_engines):
+    """
+    Fixture providing a sharded session over the three shards.
+    """
+    session = create_sharded_sessionmaker(shard_engines)()
+    yield session
+    session.close()
+
+def keys_in_shard(engine):
+    with engine.connect() as connection:
+        return set(connection.execute(select(URL.key)).scalars())
+
+def test_shard_for_key_is_stable():
+    """
+    Test that a key always maps to the same shard, within range.
+    """
+    assert shard_for_key("ABCDE", 4) == shard_for_key("ABCDE", 4)
+    assert {shard_for_key(f"K{i}", 4) for i in range(100)} == {"0", "1", "2", "3"}
+
+def test_shard_urls():
+    """
+    Test that the shard databases are derived from the base database URL.
+    """
+    assert shard_urls("sqlite:///./shortener.db", 1) == ["sqlite:///./shortener.db"]
+    assert shard_urls("sqlite:///./shortener.db", 2) == [
+        "sqlite:///./shortener-0.db",
+        "sqlite:///./shortener-1.db",
+    ]
+    with pytest.raises(ValueError):
+        shard_urls("sqlite://", 2)
+
+def test_criteria_keys():
+    """
+    Test that the short keys are extracted from the statement criteria.
+    """
+    assert ShardRouter.criteria_keys(select(URL).where(URL.key == "ABCDE")) == ["ABCDE"]
+    assert ShardRouter.criteria_keys(select(URL).where(URL.key.in_(["A", "B"]))) == ["A", "B"]
+    assert ShardRouter.criteria_keys(select(URL).where(URL.secret_key == "ABCDEFGH")) is None
+    assert ShardRouter.criteria_keys(select(URL).where(URL.key == "A", URL.is_active)) == ["A"]
+
+def test_criteria_keys_under_or_and_not_use_every_shard(db):
+    """
+    Test that key comparisons under an OR or a NOT do not restrict the shards a query runs on.
+    """
+    assert ShardRouter.criteria_keys(select(URL).where(or_(URL.key == "A", URL.clicks > 5))) is None
+    assert ShardRouter.criteria_keys(select(URL).where(not_(URL.key.in_(["A", "B"])))) is None
+    assert ShardRouter.criteria_keys(select(URL).where(URL.id.in_(select(URL.id).where(URL.key == "A")))) is None
+
+    created = [crud.create_db_url(db, schemas.URLBase(target_url=f"https://example.com/{i}")) for i in range(12)]
+    clicked = [url for url in created if shard_for_key(url.key, 3) != shard_for_key(created[0].key, 3)][:2]
+    for url in clicked:
+        crud.increment_db_clicks_by_key(db, url.key)
+
+    found = db.query(URL.key).filter(or_(URL.key == created[0].key, URL.clicks > 0)).all()
+    assert {row.key for row in found} == {created[0].key} | {url.key for url in clicked}
+
+def test_secret_keys_are_unique_across_shards(db, shard_engines, monkeypatch):
+    """
+    Test that a new entry never reuses a secret key held by another shard, with or without group commit.
+    """
+    first = crud.create_db_url(db, schemas.URLBase(target_url="https://example.com/1"), key="AAAAA")
+    other_shard_keys = [key for key in ("BBBBB", "CCCCC", "DDDDD", "EEEEE") if shard_for_key(key, 3) != shard_for_key("AAAAA", 3)]
+    drawn = iter([first.secret_key, "SECRET02", first.secret_key, "SECRET02", "SECRET03"])
+    monkeypatch.setattr(keygen, "create_random_key", lambda length=5: next(drawn))
+
+    second = crud.create_db_url(db, schemas.URLBase(target_url="https://example.com/2"), key=other_shard_keys[0])
+    assert second.secret_key == "SECRET02"
+
+    writer = GroupCommitWriter(create_sharded_sessionmaker(shard_engines))
+    try:
+        third = writer.create(crud.build_db_url(schemas.URLBase(target_url="https://example.com/3"), key=other_shard_keys[1]))
+    finally:
+        writer.stop()
+    assert third.secret_key == "SECRET03"
+    assert crud.get_db_url_by_secret_key(db, first.secret_key).key == "AAAAA"
+
+def test_crud_routes_rows_to_their_shard(db, shard_engines):
+    """
+    Test that created URLs are stored in the shard of their key and found again by key and secret key.
+    """
+    created = [
+        crud.create_db_url(db, schemas.URLBase(target_url=f"https://example.com/{i}"))
+        for i in range(12)
+    ]
+
+    for shard, engine in shard_engines.items():
+        assert keys_in_shard(engine) == {url.key for url in created if shard_for_key(url.key, 3) == shard}
+
+    for url in created:
+        assert crud.get_db_url_by_key(db, url.key).target_url == url.target_url
+        assert crud.get_db_url_by_secret_key(db, url.secret_key).key == url.key
+
+    crud.increment_db_clicks_by_key(db, created[1].key)
+    assert crud.get_redirect_by_key(db, created[1].key).target_url == created[1].target_url
+    assert crud.get_db_url_by_key(db, created[1].key).clicks == 1
+
+    assert crud.deactivate_db_url_by_secret_key(db, created[0].secret_key).is_active is False
+    assert crud.get_db_url_by_key(db, created[0].key) is None
+
+def test_writes_to_other_shards_are_not_blocked(db, shard_engines):
+    """
+    Test that a write lock held on one shard does not block writes to another shard.
+    """
+    key = next(f"K{i}" for i in range(100) if shard_for_key(f"K{i}", 3) == "1")
+    blocker = shard_engines["0"].raw_connection()
+    blocker.execute("BEGIN IMMEDIATE")
+    try:
+        db.add(URL(target_url="https://example.com", key=key, secret_key="SECRET01"))
+        db.commit()
+    finally:
+        blocker.rollback()
+        blocker.close()
+    assert keys_in_shard(shard_engines["1"]) == {key}
+
+def test_rebalance(tmp_path, db, shard_engines):
+    """
+    Test that rebalancing copies every row to the shard of its key in the new layout.
+    """
+    created = [
+        crud.create_db_url(db, schemas.URLBase(target_url=f"https://example.com/{i}"))
+        for i in range(10)
+    ]
+    (tmp_path / "new").mkdir()
+    targets = create_shard_engines(f"sqlite:///{tmp_path}/new/shortener.db", 2)
+
+    written = rebalance(shard_engines.values(), targets, batch_size=3)
+
+    assert sum(written.values()) == len(created)
+    for shard, engine in targets.items():
+        assert keys_in_shard(engine) == {url.key for url in created if shard_for_key(url.key, 2) == shard}
+
+def test_list_db_urls_pages_across_shards(db):
+    """
+    Test that keyset pages walk every shard exactly once, with the filters applied.
+    """
+    created = [
+        crud.create_db_url(db, schemas.URLBase(target_url=f"https://{'docs' if i % 2 else 'www'}.example.com/{i}"))
+        for i in range(10)
+    ]
+    crud.deactivate_db_url_by_secret_key(db, created[3].secret_key)
+
+    listed, cursor, pages = [], None, 0
+    while True:
+        rows, cursor = crud.list_db_urls(db, cursor=cursor, limit=3)
+        listed.extend(row.key for row in rows)
+        pages += 1
+        if cursor is None:
+            break
+    assert sorted(listed) == sorted(url.key for url in created)
+    assert pages <= 5
+
+    rows, cursor = crud.list_db_urls(db, limit=100, is_active=True, domain="DOCS.example.com")
+    assert cursor is None
+    assert {row.key for row in rows} == {url.key for i, url in enumerate(created) if i % 2 and i != 3}
+
+    for cursor in ("7:1", "0:1:docs.example.com"):
+        with pytest.raises(ValueError):
+            crud.list_db_urls(db, cursor=cursor)
+    with pytest.raises(ValueError):
+        crud.list_db_urls(db, cursor="0:1", domain="docs.")
+
+def list_all(db, **filters):
+    """
+    Walk every page of the listing, returning the pages of rows.
+    """
+    pages, cursor = [], None
+    while True:
+        rows, cursor = crud.list_db_urls(db, cursor=cursor, **filters)
+        pages.append(rows)
+        if cursor is None:
+            return pages
+
+@pytest.mark.parametrize("is_active", [None, True])
+def test_list_db_urls_pages_by_domain_prefix(db, is_active):
+    """
+    Test that domain prefix pages cross domain boundaries in (target_domain, id) order per shard.
+    """
+    domains = ["docs.b.example", "docs.a.example", "www.example", "docs.example.org", "docsexample.com"]
+    created = [
+        crud.create_db_url(db, schemas.URLBase(target_url=f"https://{domains[i % len(domains)]}/{i}"))
+        for i in range(20)
+    ]
+    crud.deactivate_db_url_by_secret_key(db, created[0].secret_key)
+
+    pages = list_all(db, limit=3, domain="Docs.", is_active=is_active)
+
+    listed = [row for page in pages for row in page]
+    expected = {
+        url.key for i, url in enumerate(created)
+        if url.target_url.startswith("https://docs.") and not (is_active and i == 0)
+    }
+    assert [row.key for row in listed if row.key in expected] == [row.key for row in listed]
+    assert sorted(row.key for row in listed) == sorted(expected)
+    assert all(len(page) <= 3 for page in pages)
+    # Within each shard the rows are in (target_domain, id) order, whatever the page boundaries
+    for shard in ("0", "1", "2"):
+        in_shard = [(row.target_domain, row.id) for row in listed if shard_for_key(row.key, 3) == shard]
+        assert in_shard == sorted(in_shard)
+    assert len({row.target_domain for row in pages[0] + pages[1]}) > 1
+
+def test_list_db_urls_caps_the_click_scan(db, monkeypatch):
+    """
+    Test that the click threshold visits a bounded number of rows per page and still lists every match.
+    """
+    created = [crud.create_db_url(db, schemas.URLBase(target_url=f"https://example.com/{i}")) for i in range(12)]
+    for url in created[::4]:
+        for _ in range(5):
+            crud.update_db_clicks(db, url)
+    monkeypatch.setattr(crud, "MAX_LISTING_SCAN", 2)
+
+    pages = list_all(db, limit=10, min_clicks=5)
+
+    assert sorted(row.key for page in pages for row in page) == sorted(url.key for url in created[::4])
+    assert all(len(page) <= 2 for page in pages)
+    assert len(pages) >= 6
+
+def listing_plan(engine, db, **filters):
+    """
+    Return the query plan of the statement `crud.list_db_urls` runs on a shard for some filters.
+    """
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        crud.list_db_urls(db, cursor="0:5:docs.example" if "domain" in filters else "0:5", limit=10, **filters)
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+    with engine.connect() as connection:
+        return [
+            " ".join(row[-1] for row in connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters))
+            for statement, parameters in statements
+        ]
+
+@pytest.mark.parametrize("filters, index", [
+    ({}, "PRIMARY KEY"),
+    ({"is_active": True}, "ix_urls_is_active_id"),
+    ({"is_active": False, "min_clicks": 3}, "ix_urls_is_active_id"),
+    ({"domain": "docs."}, "ix_urls_target_domain_id"),
+    ({"is_active": True, "domain": "docs."}, "ix_urls_is_active_target_domain_id"),
+    ({"is_active": False, "min_clicks": 3, "domain": "docs.example"}, "ix_urls_is_active_target_domain_id"),
+])
+def test_list_db_urls_pages_are_index_range_scans(db, shard_engines, filters, index):
+    """
+    Test that each listing query is an index range scan in the order of the pages, without sorting.
+    """
+    plans = listing_plan(shard_engines["0"], db, **filters)
+    assert plans
+    for plan in plans:
+        assert index in plan
+        assert "TEMP B-TREE" not in plan
+
+def test_bulk_deactivation_across_shards(db):
+    """
+    Test that bulk deactivation reports an outcome per secret key, whichever shard holds it.
+    """
+    created = [
+        crud.create_db_url(db, schemas.URLBase(target_url=url))
+        for url in ["https://spam.example/1", "https://cdn.spam.example/2", "https://ok.example/3", "https://ok.example/4"]
+    ]
+    crud.deactivate_db_url_by_secret_key(db, created[3].secret_key)
+
+    outcomes = crud.deactivate_db_urls_by_secret_keys(db, [created[2].secret_key, created[3].secret_key, "UNKNOWN1"])
+    assert outcomes == {
+        created[2].secret_key: crud.DEACTIVATED,
+        created[3].secret_key: crud.ALREADY_INACTIVE,
+        "UNKNOWN1": crud.NOT_FOUND,
+    }
+    assert crud.get_db_url_by_key(db, created[2].key) is None
+
+    assert crud.deactivate_db_urls_by_domain(db, "SPAM.example") == ({created[0].secret_key: crud.DEACTIVATED}, False)
+    assert crud.deactivate_db_urls_by_domain(db, "spam.example", include_subdomains=True) == (
+        {created[1].secret_key: crud.DEACTIVATED},
+        False,
+    )
+
+    found = crud.get_db_urls_by_secret_keys(db, [url.secret_key for url in created] + ["UNKNOWN1"])
+    assert set(found) == {url.secret_key for url in created}
+    assert not any(row.is_active for row in found.values())
+
+def test_domain_deactivation_is_paged_across_shards(db):
+    """
+    Test that domain deactivation stops after `limit` entries and tells whether more remain.
+    """
+    created = [
+        crud.create_db_url(db, schemas.URLBase(target_url=f"https://paged.example/{i}")) for i in range(5)
+    ]
+    created.append(crud.create_db_url(db, schemas.URLBase(target_url="https://other.example/")))
+
+    first, more = crud.deactivate_db_urls_by_domain(db, "paged.example", limit=3)
+    assert len(first) == 3 and more
+    second, more = crud.deactivate_db_urls_by_domain(db, "paged.example", limit=3)
+    assert len(second) == 2 and not more
+    assert set(first) | set(second) == {url.secret_key for url in created[:5]}
+    assert crud.deactivate_db_urls_by_domain(db, "paged.example", limit=3) == ({}, False)
+    assert crud.get_db_url_by_key(db, created[5].key) is not None
@@ -0,0 +1,84 @@
+# test_singleflight.py
+
+import threading
+import time
+import unittest
+from shortener_app.singleflight import SingleFlight
+
+class TestSingleFlight(unittest.TestCase):
+
+    def setUp(self):
+        self.group = SingleFlight()
+        self.release = threading.Event()
+
+    def run_concurrently(self, key, function, count):
+        """Start `count` threads calling the group, and wait until all but the leader are waiting."""
+        results, errors = [], []
+
+        def worker():
+            try:
+                results.append(self.group.do(key, function))
+            except Exception as error:
+                errors.append(error)
+
+        threads = [threading.Thread(target=worker) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        deadline = time.monotonic() + 5
+        while self.group.coalesced < count - 1 and time.monotonic() < deadline:
+            time.sleep(0.001)
+        self.release.set()
+        for thread in threads:
+            thread.join()
+        return results, errors
+
+    def test_concurrent_calls_share_one_lookup(self):
+        """Test that concurrent lookups of a key run the function once and share its result."""
+        def lookup():
+            self.release.wait()
+            return "https://example.com"
+
+        results, errors = self.run_concurrently("ABCDE", lookup, 8)
+
+        self.assertEqual(results, ["https://example.com"] * 8)
+        self.assertEqual(errors, [])
+        self.assertEqual(self.group.stats(), {"calls": 1, "coalesced": 7, "in_flight": 0})
+
+    def test_errors_are_shared(self):
+        """Test that the exception of the lookup is raised in every concurrent caller."""
+        def lookup():
+            self.release.wait()
+            raise RuntimeError("database is locked")
+
+        results, errors = self.run_concurrently("ABCDE", lookup, 4)
+
+        self.assertEqual(results, [])
+        self.assertEqual(len(errors), 4)
+        self.assertTrue(all(isinstance(error, RuntimeError) for error in errors))
+
+    def test_sequential_calls_are_not_cached(self):
+        """Test that a lookup runs again once the previous one is done."""
+        self.assertEqual(self.group.do("ABCDE", lambda: 1), 1)
+        self.assertEqual(self.group.do("ABCDE", lambda: 2), 2)
+        self.assertEqual(self.group.stats()["calls"], 2)
+
+    def test_forget(self):
+        """Test that a forgotten key starts a new lookup even while the previous one is in flight."""
+        started = threading.Event()
+
+        def slow_lookup():
+            started.set()
+            self.release.wait()
+            return "old"
+
+        thread = threading.Thread(target=self.group.do, args=("ABCDE", slow_lookup))
+        thread.start()
+        started.wait()
+        self.group.forget(["ABCDE"])
+        self.assertEqual(self.group.do("ABCDE", lambda: "new"), "new")
+        self.release.set()
+        thread.join()
+        self.assertEqual(self.group.stats()["in_flight"], 0)
+
+if __name__ == '__main__':
+    unittest.main()